@@ -1,38 +1,69 @@
+from typing import AsyncIterator, Awaitable
+
+from tools.context_builder import build_context  # type: ignore[import-not-found]
+
+
 class PerplexityAgent:
     """Answers questions using web search results + LLM synthesis."""
 
+    NO_RESULTS_ANSWER = "Sorry, I couldn't find relevant information online."
+
     def __init__(self, llm_client, tool_registry):
         self.llm_client = llm_client
         self.websearch_tool = tool_registry.get("web_search")
 
-    async def run(self, query: str) -> dict:
-        search_results = await self.websearch_tool(query)
+    async def run(self, query: str, prefetched: Awaitable[dict] | None = None) -> dict:
+        prompt, sources = await self._prepare(query, prefetched)
+        if prompt is None:
+            return {"answer": self.NO_RESULTS_ANSWER, "sources": []}
+
+        answer = await self.llm_client.generate_text(prompt)
+        return {"answer": answer, "sources": sources}
+
+    async def run_stream(
+        self, query: str, prefetched: Awaitable[dict] | None = None
+    ) -> AsyncIterator[dict]:
+        """Yield ``sources`` first, then ``token`` events as the answer streams."""
+        prompt, sources = await self._prepare(query, prefetched)
+        yield {"event": "sources", "data": sources}
+        if prompt is None:
+            yield {"event": "token", "data": self.NO_RESULTS_ANSWER}
+            return
+
+        async for delta in self.llm_client.generate_text_stream(prompt):
+            yield {"event": "token", "data": delta}
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def search_query(query: str) -> str:
+        """The web search this agent runs for ``query`` (used for speculation)."""
+        return query
+
+    async def _prepare(
+        self, query: str, prefetched: Awaitable[dict] | None = None
+    ) -> tuple[str | None, list[dict]]:
+        """Search and build the synthesis prompt; prompt is ``None`` if nothing was found.
+
+        ``prefetched`` is a search already started by the router, used in
+        place of a fresh search.
+        """
+        if prefetched is not None:
+            search_results = await prefetched
+        else:
+            search_results = await self.websearch_tool(self.search_query(query))
 
         results = search_results.get("results", [])
-        if not results:
-            return {
-                "answer": "Sorry, I couldn't find relevant information online.",
-                "sources": [],
-            }
-
-        context = "\n\n".join(
-            f"Source [{i + 1}]: {r['content']} (URL: {r['url']})"
-            for i, r in enumerate(results)
-        )
+        context = build_context(query, results)
+        if not context["sources"]:
+            return None, []
 
         prompt = (
             f'User\'s question: "{query}"\n\n'
-            f"Context:\n{context}\n\n"
+            f"Context:\n{context['text']}\n\n"
             "Based only on the provided context, write a comprehensive answer. "
             "Cite sources using the format [1], [2], etc."
         )
 
-        answer = await self.llm_client.generate_text(prompt)
-
-        # Deduplicate sources by URL
-        seen: dict[str, dict] = {}
-        for r in results:
-            if r["url"] not in seen:
-                seen[r["url"]] = {"url": r["url"], "title": r.get("title", "")}
-
-        return {"answer": answer, "sources": list(seen.values())}
+        # Sources are numbered by URL, matching the [n] labels in the context.
+        return prompt, context["sources"]
@@ -1,26 +1,182 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable
+
+from mcp_server.singleflight import SingleFlight  # type: ignore[import-not-found]
+from tools.context_builder import build_context  # type: ignore[import-not-found]
+from tools.roadmap_store import RoadmapStore, topic_key  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
+
+
 class RoadmapAgent:
-    """Generates a step-by-step learning roadmap for any topic."""
+    """Generates a step-by-step learning roadmap for any topic.
 
-    def __init__(self, llm_client, tool_registry):
+    With a ``RoadmapStore``, stored roadmaps are returned immediately;
+    entries older than the store TTL are regenerated in the background
+    (stale-while-revalidate) and concurrent misses for the same topic share
+    one generation.
+    """
+
+    def __init__(self, llm_client, tool_registry, store: RoadmapStore | None = None):
         self.llm_client = llm_client
         self.websearch_tool = tool_registry.get("web_search")
+        self.store = store
+        self.generations = SingleFlight("roadmap")
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.store_hits = 0
+        self.store_misses = 0
+        self.refreshes = 0
+
+    async def run(self, topic: str, prefetched: Awaitable[dict] | None = None) -> dict:
+        logger.debug("Roadmap agent started", extra={"topic": topic})
 
-    async def run(self, topic: str) -> dict:
-        print(f'Roadmap Agent started for topic: "{topic}"')
+        stored = await self._lookup(topic, prefetched)
+        if stored is not None:
+            return {"roadmap": stored["roadmap"], "cached": True, "generatedAt": stored["generated_at"]}
 
-        search_results = await self.websearch_tool(
-            f"learning path and key concepts for {topic}"
+        key = topic_key(topic)
+        if self.generations.running(key):
+            # joining a generation that already has its search results
+            self._drop_prefetched(prefetched)
+            prefetched = None
+        roadmap = await self.generations.do(
+            key, lambda: self._generate_and_store(topic, prefetched)
         )
+        return {"roadmap": roadmap}
+
+    async def run_stream(
+        self, topic: str, prefetched: Awaitable[dict] | None = None
+    ) -> AsyncIterator[dict]:
+        """Yield the roadmap Markdown as ``token`` events while it is generated."""
+        logger.debug("Roadmap agent (streaming) started", extra={"topic": topic})
+
+        stored = await self._lookup(topic, prefetched)
+        if stored is not None:
+            yield {"event": "token", "data": stored["roadmap"]}
+            return
+
+        prompt = await self._build_prompt(topic, prefetched)
+        parts: list[str] = []
+        async for delta in self.llm_client.generate_text_stream(prompt, 0.7):
+            parts.append(delta)
+            yield {"event": "token", "data": delta}
+        if self.store is not None and parts:
+            await self.store.put(topic, "".join(parts))
+
+    async def prewarm(self, topics: list[str], concurrency: int = 2, force: bool = False) -> dict:
+        """Generate and store roadmaps for ``topics`` ahead of demand.
+
+        Topics already stored (and fresh) are skipped unless ``force``.
+        Returns ``{topic: "generated" | "fresh" | "error: ..."}``.
+        """
+        if self.store is None:
+            raise RuntimeError("Roadmap store is disabled (ROADMAP_STORE_DB is not set).")
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def warm(topic: str) -> str:
+            async with semaphore:
+                if not force:
+                    stored = await self.store.get(topic)
+                    if stored is not None and not stored["stale"]:
+                        return "fresh"
+                try:
+                    await self.generations.do(
+                        topic_key(topic), lambda: self._generate_and_store(topic)
+                    )
+                    return "generated"
+                except Exception as exc:
+                    return f"error: {exc}"
+
+        outcomes = await asyncio.gather(*(warm(t) for t in topics))
+        return dict(zip(topics, outcomes))
+
+    async def aclose(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.store is not None,
+            "stored": len(self.store) if self.store is not None else 0,
+            "hits": self.store_hits,
+            "misses": self.store_misses,
+            "background_refreshes": self.refreshes,
+        }
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def search_query(topic: str) -> str:
+        """The web search this agent runs for ``topic`` (used for speculation)."""
+        return f"learning path and key concepts for {topic}"
+
+    async def _lookup(self, topic: str, prefetched: Awaitable[dict] | None) -> dict | None:
+        """Return the stored roadmap (scheduling a refresh if stale), or ``None``."""
+        if self.store is None:
+            return None
+        stored = await self.store.get(topic)
+        if stored is None:
+            self.store_misses += 1
+            return None
+        self.store_hits += 1
+        if stored["stale"]:
+            self._refresh(topic)
+        self._drop_prefetched(prefetched)  # speculative search is not needed
+        return stored
+
+    @staticmethod
+    def _drop_prefetched(prefetched: Awaitable[dict] | None) -> None:
+        """Cancel an unused speculative search (or consume its finished result)."""
+        if prefetched is None or not hasattr(prefetched, "cancel"):
+            return
+        if not prefetched.done():
+            prefetched.cancel()
+        elif not prefetched.cancelled():
+            prefetched.exception()
+
+    def _refresh(self, topic: str) -> None:
+        key = topic_key(topic)
+        if key in self._refreshing:
+            return
+        self.refreshes += 1
+
+        async def refresh() -> None:
+            try:
+                await self.generations.do(key, lambda: self._generate_and_store(topic))
+            except Exception as exc:
+                logger.warning("Background roadmap refresh failed", extra={"topic": topic, "error": str(exc)})
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.ensure_future(refresh())
+
+    async def _generate_and_store(
+        self, topic: str, prefetched: Awaitable[dict] | None = None
+    ) -> str:
+        prompt = await self._build_prompt(topic, prefetched)
+        # Roadmaps are deliberately varied (temperature 0.7), so skip the completion cache.
+        roadmap = await self.llm_client.generate_text(prompt, 0.7, use_cache=False)
+        if self.store is not None:
+            await self.store.put(topic, roadmap)
+        return roadmap
+
+    async def _build_prompt(self, topic: str, prefetched: Awaitable[dict] | None = None) -> str:
+        if prefetched is not None:
+            search_results = await prefetched
+        else:
+            search_results = await self.websearch_tool(self.search_query(topic))
         results = search_results.get("results", [])
-        context = "\n\n".join(f"Source: {r['content']}" for r in results)
+        context = build_context(self.search_query(topic), results, numbered=False)["text"]
 
-        prompt = (
+        return (
             f'Topic: "Learn {topic}"\n\n'
             f"Context:\n{context}\n\n"
             "Based on the context, generate a detailed, step-by-step learning roadmap "
             "in Markdown. Include stages (Beginner, Intermediate, Advanced) with key "
             "concepts and project ideas."
         )
-
-        roadmap = await self.llm_client.generate_text(prompt, 0.7)
-        return {"roadmap": roadmap}
@@ -1,8 +1,8 @@
 import json
+import logging
 import re
-import asyncio
 
-from tools.db_tool import find_complementary_users, test_connection  # type: ignore[import-not-found]
+logger = logging.getLogger(__name__)
 
 
 class SkillMatchAgent:
@@ -19,37 +19,30 @@ class SkillMatchAgent:
 
     def __init__(self, llm_client, tool_registry):
         self.llm_client = llm_client
+        self.find_users_tool = tool_registry.get("find_complementary_users")
 
     async def run(self, query: str) -> dict:
-        print(f'SkillMatch Agent started with query: "{query}"')
+        logger.debug("SkillMatch agent started", extra={"query": query})
 
         try:
-            # 1. Test API connection
-            print("🔌 Testing backend API connection...")
-            conn = await test_connection()
-            if not conn.get("success"):
-                raise RuntimeError(f"Backend API connection failed: {conn.get('error')}")
-            print("✅ Backend API is accessible!")
-
-            # 2. Extract skills using LLM
+            # 1. Extract skills using LLM
+            #    (backend health is tracked by its circuit breaker, which
+            #    fails the search below fast while the backend is down)
             extraction_prompt = self._build_extraction_prompt(query)
             raw = await self.llm_client.generate_text(extraction_prompt, 0.1)
-            print(f"Raw LLM extraction result: {raw}")
+            logger.debug("Raw LLM extraction result", extra={"raw": raw})
             skills = self._parse_skills(raw, query)
-            print(f"Extracted skills: {skills}")
-
-            # 3. Search for complementary users (with 8 s timeout)
-            print("Searching for matching users...")
-            matched_users = await asyncio.wait_for(
-                find_complementary_users(
-                    skills.get("skillsRequired", []),
-                    skills.get("skillsOffered", []),
-                ),
-                timeout=8.0,
+            logger.info("Extracted skills", extra={"skills": skills})
+
+            # 2. Search for complementary users (bounded by the tool's own
+            #    httpx timeout, so the breaker sees a hanging backend)
+            matched_users = await self.find_users_tool(
+                skills.get("skillsRequired", []),
+                skills.get("skillsOffered", []),
             )
-            print(f"Found {len(matched_users)} matching users")
+            logger.info("Found matching users", extra={"matches": len(matched_users)})
 
-            # 4. Build response
+            # 3. Build response
             response = self._format_response(skills, matched_users)
             return {
                 "matches": matched_users,
@@ -62,7 +55,7 @@ class SkillMatchAgent:
             }
 
         except Exception as exc:
-            print(f"Error in SkillMatch Agent: {exc}")
+            logger.warning("SkillMatch agent failed", extra={"error": str(exc)})
             return self._error_response(str(exc))
 
     # ── helpers ───────────────────────────────────────────────────────────
@@ -4,39 +4,129 @@ Study Group Formation Agent
 Uses clustering algorithms (K-Means / Agglomerative) to automatically form
 optimal study groups among students based on complementary academic strengths
 and weaknesses.
+
+The work is split so large cohorts stay cheap to serve:
+
+- :func:`plan_study_groups` — clustering, assignment and group statistics
+  on the score matrix (CPU-bound; runs in the compute pool).
+- :func:`summarize_study_groups` — the chat response and per-group summary.
+- :func:`iter_study_group_report` — the Markdown report, one chunk per
+  group, so it can be streamed or written to a file without ever holding
+  the whole document in memory.
 """
 
 from __future__ import annotations
 
-from tools.clustering_tool import form_study_groups, compute_group_stats  # type: ignore[import-not-found]
+import logging
+import math
+import time
+from typing import Iterator
+
+import numpy as np  # type: ignore[import-untyped]
+
+from mcp_server.metrics import observe_stage  # type: ignore[import-not-found]
+from tools.clustering_tool import (  # type: ignore[import-not-found]
+    compute_partition_stats,
+    form_group_indices,
+    groups_to_labels,
+    partition_group_stats,
+    resolve_method,
+    skill_matrix,
+)
+from tools.cohort_io import cohort_from_columns, load_cohort  # type: ignore[import-not-found]
+from tools.group_optimizer import improve_groups  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
 
 
 # Default academic subjects used for profiling
 DEFAULT_SUBJECTS = ["Math", "Science", "English", "Programming", "Art", "History"]
 
+NO_STUDENTS_RESPONSE = "❌ No student data provided. Please supply a list of students with skill profiles."
+
 
 class StudyGroupAgent:
     """Agent that receives student data and produces balanced study groups."""
 
-    def __init__(self, llm_client=None, tool_registry=None):
+    def __init__(self, llm_client=None, tool_registry=None, compute=None):
         self.llm_client = llm_client
+        # Optional ComputePool; without one the pipeline runs inline.
+        self.compute = compute
 
-    async def run(self, query: str | dict) -> dict:
+    async def run(self, query: str | dict, report: bool = True) -> dict:
         """Run the study-group formation pipeline.
 
         ``query`` can be:
         - A **dict** with keys ``students``, optional ``subjects``,
-          ``target_size``, and ``method``.
+          ``target_size``, ``method`` and ``assignment`` (``"greedy"`` or
+          ``"local_search"``).  Instead of ``students`` the cohort may be
+          given column-wise as ``names`` plus a ``scores`` matrix.
         - A **string** — the agent will use built-in demo data.
+
+        With ``report=False`` the Markdown report is not rendered.
+        """
+        request = self._parse(query)
+        if request is None:
+            return {"response": NO_STUDENTS_RESPONSE, "groups": [], "report": ""}
+        return await self._submit(study_group_job, *request, report)
+
+    async def plan(self, query: str | dict) -> dict | None:
+        """Form the groups without rendering anything.
+
+        Returns the plan consumed by :func:`summarize_study_groups` and
+        :func:`iter_study_group_report`, or ``None`` without students.
+        """
+        request = self._parse(query)
+        if request is None:
+            return None
+        names, scores, subjects, n_groups, target_size, method, assignment = request
+        # Only the score matrix crosses the process boundary, and only
+        # index groups and statistics come back.
+        plan = await self._submit(plan_study_groups, scores, n_groups, target_size, method, assignment)
+        plan.update(names=names, scores=scores, subjects=subjects, target_size=target_size)
+        return plan
+
+    async def run_file(
+        self,
+        path: str,
+        fmt: str | None = None,
+        subjects: list[str] | None = None,
+        target_size: int = 4,
+        method: str = "kmeans",
+        assignment: str = "greedy",
+        report: bool = False,
+    ) -> dict:
+        """Form groups for a cohort file (see :mod:`tools.cohort_io`).
+
+        The file is parsed by the worker that clusters it, so the cohort is
+        never materialised as Python objects in the server process.
         """
-        print(f"📚 StudyGroup Agent started")
+        logger.debug("StudyGroup agent started (file upload)", extra={"format": fmt or "auto"})
+        return await self._submit(
+            study_group_file_job, path, fmt, subjects, target_size, method, assignment, report
+        )
+
+    # ── helpers ──────────────────────────────────────────────────────────
+
+    def _parse(self, query: str | dict) -> tuple | None:
+        logger.debug("StudyGroup agent started")
 
         # ── parse input ──────────────────────────────────────────────────
+        if isinstance(query, dict) and query.get("scores") is not None:
+            names, scores, subjects = cohort_from_columns(
+                query.get("names"), query["scores"], query.get("subjects")
+            )
+            return self._request(
+                names, scores, subjects,
+                query.get("target_size", 4), query.get("method", "kmeans"),
+                query.get("assignment", "greedy"),
+            )
         if isinstance(query, dict):
             students = query.get("students", [])
             subjects = query.get("subjects", DEFAULT_SUBJECTS)
             target_size = query.get("target_size", 4)
             method = query.get("method", "kmeans")
+            assignment = query.get("assignment", "greedy")
         else:
             # When called via text query, use demo data
             from demo.demo_data import DEMO_STUDENTS, SUBJECTS as DEMO_SUBJECTS  # type: ignore[import-not-found]
@@ -44,105 +134,245 @@ class StudyGroupAgent:
             subjects = DEMO_SUBJECTS
             target_size = 4
             method = "kmeans"
-            print(f"   (using demo dataset with {len(students)} students)")
+            assignment = "greedy"
+            logger.debug("Using the demo dataset", extra={"students": len(students)})
 
         if not students:
-            return {
-                "response": "❌ No student data provided. Please supply a list of students with skill profiles.",
-                "groups": [],
-                "report": "",
-            }
-
-        n_groups = max(1, -(-len(students) // target_size))
-        print(f"   Forming {n_groups} groups of ~{target_size} from {len(students)} students  [method={method}]")
-
-        # ── cluster ──────────────────────────────────────────────────────
-        groups = form_study_groups(
-            students, subjects,
-            n_groups=n_groups,
-            target_size=target_size,
-            method=method,
+            return None
+        names = [s["name"] for s in students]
+        scores = skill_matrix(students, subjects)
+        return self._request(names, scores, subjects, target_size, method, assignment)
+
+    @staticmethod
+    def _request(names, scores, subjects, target_size, method, assignment) -> tuple | None:
+        if not len(names):
+            return None
+        n_groups = max(1, -(-len(names) // target_size))
+        logger.info(
+            "Forming study groups",
+            extra={"groups": n_groups, "target_size": target_size, "students": len(names), "method": method},
         )
+        return names, scores, subjects, n_groups, target_size, method, assignment
 
-        # ── build report text ────────────────────────────────────────────
-        report_lines: list[str] = []
-        report_lines.append("# 📊 Study Group Composition Report\n")
-        report_lines.append(f"**Algorithm**: {str(method).title()}  |  "
-                            f"**Students**: {len(students)}  |  "
-                            f"**Groups**: {len(groups)}  |  "
-                            f"**Target size**: {target_size}\n")
-        report_lines.append(f"**Subjects evaluated**: {', '.join(subjects)}\n")
-        report_lines.append("---\n")
-
-        group_summaries: list[dict] = []
-
-        for i, group in enumerate(groups, 1):
-            stats = compute_group_stats(group, subjects)
-            report_lines.append(f"## Group {i}  ({len(group)} members)  —  "
-                                f"Diversity Score: **{stats['diversity_score']}/10**\n")
-
-            # Member table
-            report_lines.append("| Student | " + " | ".join(subjects) + " | Role |")
-            report_lines.append("|" + "---|" * (len(subjects) + 2))
-
-            for s in group:
-                scores = [str(s["skills"].get(subj, "–")) for subj in subjects]
-                strengths = [subj for subj in subjects if s["skills"].get(subj, 0) >= 7]
-                role = f"Lead in {', '.join(strengths)}" if strengths else "General Support"
-                report_lines.append(f"| {s['name']} | " + " | ".join(scores) + f" | {role} |")
-
-            # Per-subject coverage
-            report_lines.append(f"\n**Skill Coverage:**")
-            for subj, v in stats["subjects"].items():
-                bar_len = int(v["mean"])
-                bar = "█" * bar_len + "░" * (10 - bar_len)
-                report_lines.append(f"  - {subj}: {bar}  avg {v['mean']}  (range {v['min']:.0f}–{v['max']:.0f})")
-            report_lines.append("")
-
-            group_summaries.append({
-                "group_id": i,
-                "members": [s["name"] for s in group],
-                "size": len(group),
-                "diversity_score": stats["diversity_score"],
-                "stats": stats["subjects"],
-            })
-
-        # Overall summary
-        avg_div = sum(g["diversity_score"] for g in group_summaries) / len(group_summaries) if group_summaries else 0
-        report_lines.append("---\n")
-        report_lines.append(f"## 🏆 Overall Complementarity Score: **{avg_div:.2f}/10**\n")
-        if avg_div >= 5:
-            report_lines.append("✅ Groups are well-balanced with strong complementary skill coverage.\n")
+    async def _submit(self, fn, *args):
+        if self.compute is not None:
+            result = await self.compute.run(fn, *args)
         else:
-            report_lines.append("⚠️ Groups have moderate overlap — consider adjusting target group size.\n")
+            result = fn(*args)
+        # stage timings measured wherever the job ran
+        for stage, seconds in result.pop("timings", {}).items():
+            observe_stage(stage, seconds, "studygroup")
+        return result
 
-        report_text = "\n".join(report_lines)
 
-        # ── response ─────────────────────────────────────────────────────
-        short_summary_parts = []
-        for g in group_summaries:
-            members = ", ".join(g["members"])
-            short_summary_parts.append(
-                f"**Group {g['group_id']}** ({g['size']} members, diversity {g['diversity_score']}): {members}"
-            )
-        short_summary = "\n".join(short_summary_parts)
-
-        response = (
-            f"📚 **Study Groups Formed Successfully!**\n\n"
-            f"Created **{len(groups)} groups** from **{len(students)} students** "
-            f"using **{str(method).title()} clustering**.\n\n"
-            f"{short_summary}\n\n"
-            f"🏆 **Overall Complementarity Score: {avg_div:.2f}/10**\n\n"
-            f"Each group has been optimised for maximum skill diversity, "
-            f"ensuring every student can both teach and learn from their peers."
+# ── pipeline stages ──────────────────────────────────────────────────────────
+
+def plan_study_groups(
+    scores: np.ndarray,
+    n_groups: int,
+    target_size: int,
+    method: str,
+    assignment: str = "greedy",
+) -> dict:
+    """Cluster, assign and compute statistics — safe to run in a worker process.
+
+    Returns ``{"method", "assignment", "groups", "partition", "optimization"}``
+    where ``groups`` are row indices into ``scores``.
+    """
+    started = time.perf_counter()
+    method = resolve_method(method, len(scores))
+    groups = form_group_indices(scores, n_groups, target_size, method)
+    filled = np.where(np.isnan(scores), 5.0, scores)
+    optimization = None
+    if assignment == "local_search":
+        groups, optimization = improve_groups(filled, groups)
+    partition = compute_partition_stats(filled, groups_to_labels(groups, len(scores)), len(groups))
+    return {
+        "method": method,
+        "assignment": assignment,
+        "groups": groups,
+        "partition": partition,
+        "optimization": optimization,
+        "timings": {"clustering": time.perf_counter() - started},
+    }
+
+
+def study_group_job(
+    names: list[str],
+    scores: np.ndarray,
+    subjects: list[str],
+    n_groups: int,
+    target_size: int,
+    method: str,
+    assignment: str = "greedy",
+    report: bool = True,
+) -> dict:
+    """Everything :meth:`StudyGroupAgent.run` returns, computed in one go so
+    the whole CPU-bound part can run in a worker process.
+    """
+    plan = plan_study_groups(scores, n_groups, target_size, method, assignment)
+    plan.update(names=names, scores=scores, subjects=subjects, target_size=target_size)
+    result = summarize_study_groups(plan)
+    result["timings"] = plan.pop("timings")
+    if report:
+        started = time.perf_counter()
+        result["report"] = "\n".join(line for section in _report_sections(plan) for line in section)
+        result["timings"]["report"] = time.perf_counter() - started
+    return result
+
+
+def study_group_file_job(
+    path: str,
+    fmt: str | None,
+    subjects: list[str] | None,
+    target_size: int,
+    method: str,
+    assignment: str,
+    report: bool,
+) -> dict:
+    """Load a cohort file and form its groups; the report is optional."""
+    names, scores, subjects = load_cohort(path, fmt, subjects)
+    if not names:
+        return {"response": NO_STUDENTS_RESPONSE, "groups": [], "report": ""}
+    n_groups = max(1, -(-len(names) // target_size))
+    return study_group_job(names, scores, subjects, n_groups, target_size, method, assignment, report)
+
+
+def _diversity_scores(plan: dict) -> list[float]:
+    return [round(float(d), 2) for d in plan["partition"]["diversity"]]
+
+
+def _average_diversity(plan: dict) -> float:
+    scores = _diversity_scores(plan)
+    return sum(scores) / len(scores) if scores else 0
+
+
+def summarize_study_groups(plan: dict) -> dict:
+    """Chat response and structured per-group summary for a plan (no report)."""
+    names, subjects, groups = plan["names"], plan["subjects"], plan["groups"]
+    method = plan["method"]
+
+    group_summaries: list[dict] = []
+    for i, group in enumerate(groups, 1):
+        stats = partition_group_stats(plan["partition"], i - 1, subjects)
+        group_summaries.append({
+            "group_id": i,
+            "members": [names[idx] for idx in group],
+            "size": len(group),
+            "diversity_score": stats["diversity_score"],
+            "stats": stats["subjects"],
+        })
+    avg_div = _average_diversity(plan)
+
+    # ── response ─────────────────────────────────────────────────────
+    short_summary_parts = []
+    for g in group_summaries:
+        members = ", ".join(g["members"])
+        short_summary_parts.append(
+            f"**Group {g['group_id']}** ({g['size']} members, diversity {g['diversity_score']}): {members}"
         )
+    short_summary = "\n".join(short_summary_parts)
+
+    response = (
+        f"📚 **Study Groups Formed Successfully!**\n\n"
+        f"Created **{len(groups)} groups** from **{len(names)} students** "
+        f"using **{str(method).title()} clustering**.\n\n"
+        f"{short_summary}\n\n"
+        f"🏆 **Overall Complementarity Score: {avg_div:.2f}/10**\n\n"
+        f"Each group has been optimised for maximum skill diversity, "
+        f"ensuring every student can both teach and learn from their peers."
+    )
+
+    return {
+        "response": response,
+        "groups": group_summaries,
+        "studentCount": len(names),
+        "groupCount": len(groups),
+        "method": method,
+        "assignment": plan["assignment"],
+        "optimization": plan["optimization"],
+        "averageDiversity": round(float(avg_div), 2),
+    }
+
+
+def iter_study_group_report(plan: dict) -> Iterator[str]:
+    """Yield the Markdown report in chunks: header, one per group, footer.
+
+    Concatenating the chunks gives the ``report`` of
+    :meth:`StudyGroupAgent.run` plus a trailing newline.
+    """
+    rendering = 0.0
+    sections = _report_sections(plan)
+    while True:
+        started = time.perf_counter()
+        section = next(sections, None)
+        chunk = None if section is None else "\n".join(section) + "\n"
+        rendering += time.perf_counter() - started
+        if chunk is None:
+            break
+        yield chunk
+    observe_stage("report", rendering, "studygroup")
+
+
+def _format_score(value: float) -> str:
+    if math.isnan(value):
+        return "–"
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _report_sections(plan: dict) -> Iterator[list[str]]:
+    names, scores, subjects, groups = plan["names"], plan["scores"], plan["subjects"], plan["groups"]
+    method, optimization = plan["method"], plan["optimization"]
+
+    # ── header ───────────────────────────────────────────────────────
+    header: list[str] = []
+    header.append("# 📊 Study Group Composition Report\n")
+    header.append(f"**Algorithm**: {str(method).title()}  |  "
+                  f"**Students**: {len(names)}  |  "
+                  f"**Groups**: {len(groups)}  |  "
+                  f"**Target size**: {plan['target_size']}\n")
+    header.append(f"**Subjects evaluated**: {', '.join(subjects)}\n")
+    if optimization is not None:
+        header.append(f"**Local search**: diversity {optimization['before']:.2f} → "
+                      f"{optimization['after']:.2f}  ({optimization['swaps']} swaps "
+                      f"in {optimization['elapsed_ms']:.0f} ms)\n")
+    header.append("---\n")
+    yield header
+
+    # ── one section per group ────────────────────────────────────────
+    for i, group in enumerate(groups, 1):
+        stats = partition_group_stats(plan["partition"], i - 1, subjects)
+        lines: list[str] = []
+        lines.append(f"## Group {i}  ({len(group)} members)  —  "
+                     f"Diversity Score: **{stats['diversity_score']}/10**\n")
+
+        # Member table
+        lines.append("| Student | " + " | ".join(subjects) + " | Role |")
+        lines.append("|" + "---|" * (len(subjects) + 2))
+
+        for idx in group:
+            row = scores[idx]
+            cells = [_format_score(v) for v in row]
+            strengths = [subj for subj, v in zip(subjects, row) if v >= 7]
+            role = f"Lead in {', '.join(strengths)}" if strengths else "General Support"
+            lines.append(f"| {names[idx]} | " + " | ".join(cells) + f" | {role} |")
+
+        # Per-subject coverage
+        lines.append(f"\n**Skill Coverage:**")
+        for subj, v in stats["subjects"].items():
+            bar_len = int(v["mean"])
+            bar = "█" * bar_len + "░" * (10 - bar_len)
+            lines.append(f"  - {subj}: {bar}  avg {v['mean']}  (range {v['min']:.0f}–{v['max']:.0f})")
+        lines.append("")
+        yield lines
 
-        return {
-            "response": response,
-            "groups": group_summaries,
-            "report": report_text,
-            "studentCount": len(students),
-            "groupCount": len(groups),
-            "method": method,
-            "averageDiversity": round(float(avg_div), 2),
-        }
+    # ── overall summary ──────────────────────────────────────────────
+    avg_div = _average_diversity(plan)
+    footer: list[str] = []
+    footer.append("---\n")
+    footer.append(f"## 🏆 Overall Complementarity Score: **{avg_div:.2f}/10**\n")
+    if avg_div >= 5:
+        footer.append("✅ Groups are well-balanced with strong complementary skill coverage.\n")
+    else:
+        footer.append("⚠️ Groups have moderate overlap — consider adjusting target group size.\n")
+    yield footer
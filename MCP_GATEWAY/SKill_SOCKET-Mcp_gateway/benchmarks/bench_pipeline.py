@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Benchmark — Study-Group Pipeline
+================================
+Times every stage of the study-group pipeline on synthetic cohorts and
+records its peak memory, writing the results as JSON so runs can be
+compared.
+
+Cohorts are generated from the 24 archetypes in ``demo/demo_data.py``:
+each synthetic student copies an archetype's profile with ±1 noise, and
+subjects beyond the six demo subjects reuse the archetype's scores in a
+rotated order, so any subject count keeps the same kind of structure.
+
+Each stage is timed ``--repeat`` times (best run reported) with tracing
+off, then run once more under ``tracemalloc`` for its peak allocation.
+Stages that cannot finish at a given size are skipped and say why:
+exact K-Means and Ward use one cluster per ``target_size`` students, which
+is quadratic, so they only run up to ``--exact-limit`` students.
+
+The default run goes up to 1M students and takes the better part of an
+hour; pass ``--sizes`` for a quick check.
+
+Usage:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 24 1000 10000 --subjects 6 24
+    python benchmarks/bench_pipeline.py --output new.json --compare old.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np  # type: ignore[import-untyped]
+
+# Ensure project root is on the path so relative imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from demo.demo_data import DEMO_STUDENTS, SUBJECTS  # noqa: E402  # type: ignore[import-not-found]
+from reports.group_report import generate_report  # noqa: E402  # type: ignore[import-not-found]
+from tools.clustering_tool import (  # noqa: E402  # type: ignore[import-not-found]
+    build_skill_vectors,
+    cluster_agglomerative,
+    cluster_kmeans,
+    cluster_profiles,
+    complementary_rebalance,
+    compute_group_stats,
+    compute_partition_stats,
+    groups_to_labels,
+    skill_matrix,
+)
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "pipeline_results.json")
+
+
+# ── synthetic cohorts ────────────────────────────────────────────────────────
+
+def synthetic_subjects(n_subjects: int) -> list[str]:
+    """The demo subjects, then numbered repeats (``Math 2``, ``Science 2`` …)."""
+    return [
+        SUBJECTS[j] if j < len(SUBJECTS) else f"{SUBJECTS[j % len(SUBJECTS)]} {j // len(SUBJECTS) + 1}"
+        for j in range(n_subjects)
+    ]
+
+
+def synthetic_cohort(
+    n: int, n_subjects: int = 6, seed: int = 0, missing: float = 0.0
+) -> tuple[list[dict], list[str]]:
+    """``n`` students scaled up from the demo archetypes.
+
+    ``missing`` is the fraction of scores left out of the ``skills`` dicts.
+    """
+    rng = np.random.default_rng(seed)
+    subjects = synthetic_subjects(n_subjects)
+    archetypes = np.array([[s["skills"][subj] for subj in SUBJECTS] for s in DEMO_STUDENTS])
+    base = len(SUBJECTS)
+    columns = [(j + j // base) % base for j in range(n_subjects)]
+
+    picks = np.arange(n) % len(archetypes)
+    scores = archetypes[picks][:, columns] + rng.integers(-1, 2, size=(n, n_subjects))
+    scores = np.clip(scores, 1, 10).tolist()
+    present = (rng.random((n, n_subjects)) >= missing).tolist() if missing else None
+
+    students = []
+    for i in range(n):
+        row = scores[i]
+        if present is None:
+            skills = dict(zip(subjects, row))
+        else:
+            skills = {subj: v for subj, v, keep in zip(subjects, row, present[i]) if keep}
+        students.append({"name": f"{DEMO_STUDENTS[picks[i]]['name']} #{i // len(archetypes) + 1}", "skills": skills})
+    return students, subjects
+
+
+# ── measurement ──────────────────────────────────────────────────────────────
+
+def measure(fn, *args, repeat: int = 1, memory: bool = True) -> tuple[dict, object]:
+    """Best-of-``repeat`` wall time, plus one traced run for peak memory."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    record = {"seconds": round(best, 6)}
+    if memory:
+        result = None
+        tracemalloc.start()
+        try:
+            result = fn(*args)
+            record["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 3)
+        finally:
+            tracemalloc.stop()
+    return record, result
+
+
+def bench_cohort(
+    n: int,
+    n_subjects: int,
+    target_size: int,
+    exact_limit: int,
+    repeat: int,
+    memory: bool,
+    missing: float,
+) -> dict:
+    students, subjects = synthetic_cohort(n, n_subjects, seed=n + n_subjects, missing=missing)
+    n_groups = max(1, -(-n // target_size))
+    stages: dict[str, dict] = {}
+
+    def run(name: str, fn, *args):
+        print(f"   {name:<34}", end="", flush=True)
+        stages[name], result = measure(fn, *args, repeat=repeat, memory=memory)
+        peak = f"{stages[name]['peak_mb']:10.1f} MB" if memory else ""
+        print(f"{stages[name]['seconds']:10.3f} s{peak}")
+        return result
+
+    def skip(name: str, reason: str) -> None:
+        stages[name] = {"skipped": reason}
+        print(f"   {name:<34}{'skipped':>12}  ({reason})")
+
+    vectors = run("build_skill_vectors", build_skill_vectors, students, subjects)
+
+    labels = None
+    if n <= exact_limit:
+        labels = run("cluster_kmeans", cluster_kmeans, vectors, n_groups)
+        run("cluster_agglomerative", cluster_agglomerative, vectors, n_groups)
+    else:
+        reason = f"n > exact limit {exact_limit}"
+        skip("cluster_kmeans", reason)
+        skip("cluster_agglomerative", reason)
+    minibatch = run("cluster_profiles[minibatch]", cluster_profiles, vectors, n_groups, "minibatch")
+    if labels is None:
+        labels = minibatch
+
+    groups = run(
+        "complementary_rebalance", complementary_rebalance,
+        students, labels, vectors, subjects, n_groups, target_size,
+    )
+    run("compute_group_stats", lambda: [compute_group_stats(g, subjects) for g in groups])
+
+    matrix = np.nan_to_num(skill_matrix(students, subjects), nan=5.0)
+    index = {id(s): i for i, s in enumerate(students)}
+    index_groups = [[index[id(s)] for s in g] for g in groups]
+    run(
+        "compute_partition_stats", compute_partition_stats,
+        matrix, groups_to_labels(index_groups, n), len(index_groups),
+    )
+    run("generate_report", generate_report, groups, subjects, "kmeans", target_size)
+
+    return {"students": n, "subjects": n_subjects, "groups": n_groups, "stages": stages}
+
+
+# ── comparison ───────────────────────────────────────────────────────────────
+
+def compare(
+    results: list[dict], settings: dict, baseline_path: str, tolerance: float, min_seconds: float
+) -> list[str]:
+    """Stages more than ``tolerance`` slower than in ``baseline_path``.
+
+    Stages under ``min_seconds`` in both runs are too noisy to compare.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print(f"⚠️  {baseline_path} was run with different settings: {baseline.get('settings')}")
+    previous = {
+        (r["students"], r["subjects"], stage): record.get("seconds")
+        for r in baseline["results"]
+        for stage, record in r["stages"].items()
+    }
+    regressions = []
+    for r in results:
+        for stage, record in r["stages"].items():
+            old = previous.get((r["students"], r["subjects"], stage))
+            new = record.get("seconds")
+            if old and new and max(old, new) >= min_seconds and new > old * (1 + tolerance):
+                regressions.append(
+                    f"{stage} @ {r['students']} students × {r['subjects']} subjects: "
+                    f"{old:.3f}s → {new:.3f}s ({new / old:.2f}x)"
+                )
+    return regressions
+
+
+def environment() -> dict:
+    import sklearn  # type: ignore[import-untyped]
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main(args: argparse.Namespace) -> int:
+    results = []
+    for n_subjects in args.subjects:
+        for n in args.sizes:
+            print(f"\n🧪 {n:,} students × {n_subjects} subjects")
+            results.append(bench_cohort(
+                n, n_subjects, args.target, args.exact_limit, args.repeat, not args.no_memory, args.missing,
+            ))
+
+    report = {
+        "environment": environment(),
+        "settings": {
+            "target_size": args.target,
+            "exact_limit": args.exact_limit,
+            "repeat": args.repeat,
+            "missing": args.missing,
+            "memory": not args.no_memory,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, report["settings"], args.compare, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} stage(s) slower than {args.compare} by > {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"\n✅ No stage slower than {args.compare} by > {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the study-group pipeline stage by stage")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[6, 12])
+    parser.add_argument("--target", type=int, default=4, help="Target group size (default: 4)")
+    parser.add_argument(
+        "--exact-limit", type=int, default=5_000,
+        help="Largest cohort for exact K-Means / Ward (default: 5000)",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage; the best is kept")
+    parser.add_argument("--missing", type=float, default=0.0, help="Fraction of scores left out")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="Allowed slow-down before a stage counts as a regression (default: 0.25)",
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.05,
+        help="Ignore stages faster than this in both runs when comparing (default: 0.05)",
+    )
+    sys.exit(main(parser.parse_args()))
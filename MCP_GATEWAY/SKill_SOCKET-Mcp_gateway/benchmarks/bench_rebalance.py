@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark — Complementary Rebalance
+===================================
+Times the heap-based ``complementary_rebalance`` core against the original
+O(n·g) scan across cohort sizes and group counts, and checks both produce
+identical assignments (including the overflow path, where ``n_groups`` is
+too small for ``target_size`` + 1).
+
+Usage:
+    python benchmarks/bench_rebalance.py
+    python benchmarks/bench_rebalance.py --sizes 1000 10000 40000 --target 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np  # type: ignore[import-untyped]
+
+# Ensure project root is on the path so relative imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tools.clustering_tool import _rebalance_indices  # noqa: E402  # type: ignore[import-not-found]
+
+
+def reference_rebalance(vectors: np.ndarray, n_groups: int, target_size: int) -> list[list[int]]:
+    """The original pure-Python greedy scan, kept as the correctness oracle."""
+    n = len(vectors)
+    max_size = target_size + 1
+    groups: list[list[int]] = [[] for _ in range(n_groups)]
+    group_sums = np.zeros((n_groups, vectors.shape[1]))
+    order = sorted(range(n), key=lambda i: float(vectors[i].max() - vectors[i].min()), reverse=True)
+    for idx in order:
+        best_group, best_score = -1, float("inf")
+        strongest_subj = int(np.argmax(vectors[idx]))
+        for g in range(n_groups):
+            if len(groups[g]) >= max_size:
+                continue
+            score = float(group_sums[g][strongest_subj])
+            if score < best_score:
+                best_score, best_group = score, g
+        if best_group == -1:
+            best_group = min(range(n_groups), key=lambda g: len(groups[g]))
+        groups[best_group].append(idx)
+        group_sums[best_group] += vectors[idx]
+    return groups
+
+
+def synthetic_vectors(n: int, n_subjects: int, seed: int = 0) -> np.ndarray:
+    """Integer 1-10 scores scaled to [0, 1] — plenty of exact ties."""
+    rng = np.random.default_rng(seed)
+    return (rng.integers(1, 11, size=(n, n_subjects)) - 1) / 9.0
+
+
+def timed(fn, *args) -> tuple[float, object]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main(sizes: list[int], subjects: int, target_size: int, reference_limit: int) -> None:
+    print(f"{'n':>9} {'groups':>7} {'heap (s)':>10} {'scan (s)':>10} {'speed-up':>9}  identical")
+    for n in sizes:
+        vectors = synthetic_vectors(n, subjects, seed=n)
+        for n_groups in (max(1, -(-n // target_size)), max(1, n // (4 * (target_size + 1)))):
+            fast_s, fast = timed(_rebalance_indices, vectors, n_groups, target_size)
+            if n <= reference_limit:
+                slow_s, slow = timed(reference_rebalance, vectors, n_groups, target_size)
+                speedup = f"{slow_s / fast_s:8.1f}x"
+                same = "yes" if fast == slow else "NO"
+                slow_col = f"{slow_s:10.3f}"
+            else:
+                slow_col, speedup, same = f"{'–':>10}", f"{'–':>9}", "–"
+            print(f"{n:>9} {n_groups:>7} {fast_s:10.3f} {slow_col} {speedup}  {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark complementary_rebalance")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 1_000, 5_000, 20_000, 100_000])
+    parser.add_argument("--subjects", type=int, default=6)
+    parser.add_argument("--target", type=int, default=4, help="Target group size (default: 4)")
+    parser.add_argument(
+        "--reference-limit", type=int, default=20_000,
+        help="Largest n for which the original O(n·g) scan is also timed",
+    )
+    args = parser.parse_args()
+    main(args.sizes, args.subjects, args.target, args.reference_limit)
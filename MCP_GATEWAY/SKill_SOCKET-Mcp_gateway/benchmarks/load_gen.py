@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Load Generator — /mcp/invoke
+============================
+Drives the gateway's ``/mcp/invoke`` endpoint at a target request rate and
+reports throughput and p50 / p95 / p99 latency per agent.
+
+Arrivals are open-loop: request *i* is sent at ``i / rps`` (or with
+exponential gaps under ``--poisson``) whether or not earlier requests have
+finished, so a slow gateway shows up as latency rather than as a lower
+offered rate.  ``--max-in-flight`` caps outstanding requests; arrivals
+that find the cap full are counted as ``dropped``.
+
+Queries cycle through a built-in mix covering every agent, or come from
+``--queries`` (one per line).  Suffix them with ``--unique`` to defeat the
+gateway's coalescing and caches.
+
+Run the gateway against ``benchmarks/stub_upstreams.py`` to test it without
+touching the real upstreams.
+
+Usage:
+    python benchmarks/load_gen.py --rps 20 --duration 30
+    python benchmarks/load_gen.py --url http://127.0.0.1:8000 --rps 50 --unique --output load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+import httpx  # type: ignore[import-untyped]
+
+DEFAULT_QUERIES = [
+    "What is a binary search tree?",
+    "Explain how HTTPS works",
+    "Give me a roadmap to learn machine learning",
+    "Study plan for learning Rust",
+    "I can teach React and want to learn Python, match me",
+    "Find users who offer Flutter and need JavaScript",
+    "Form study groups for my class",
+    "What are the latest features in Python 3.12?",
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (``q`` in 0–100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    ms = [s * 1000 for s in latencies]
+    return {
+        "requests": len(ms),
+        "throughput_rps": round(len(ms) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 50), 1),
+        "p95_ms": round(percentile(ms, 95), 1),
+        "p99_ms": round(percentile(ms, 99), 1),
+        "max_ms": round(max(ms), 1) if ms else 0.0,
+    }
+
+
+class LoadRun:
+    """Outcome of every request of one run, grouped by agent."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.dropped = 0
+        self.lag: list[float] = []
+
+    def record(self, agent: str, seconds: float) -> None:
+        self.latencies.setdefault(agent, []).append(seconds)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, elapsed: float, settings: dict) -> dict:
+        completed = [s for values in self.latencies.values() for s in values]
+        return {
+            "settings": settings,
+            "elapsed_s": round(elapsed, 2),
+            "overall": summarize(completed, elapsed),
+            "agents": {agent: summarize(values, elapsed) for agent, values in sorted(self.latencies.items())},
+            "errors": dict(sorted(self.errors.items())),
+            "dropped": self.dropped,
+            "max_send_lag_ms": round(max(self.lag, default=0.0) * 1000, 1),
+        }
+
+
+async def invoke(client: httpx.AsyncClient, url: str, query: str, run: LoadRun) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, json={"query": query})
+    except httpx.TimeoutException:
+        run.error("timeout")
+        return
+    except httpx.HTTPError as exc:
+        run.error(type(exc).__name__)
+        return
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        run.error(f"http_{response.status_code}")
+        return
+    run.record(response.json().get("agentUsed", "unknown"), elapsed)
+
+
+async def generate(args: argparse.Namespace, queries: list[str]) -> dict:
+    url = f"{args.url.rstrip('/')}/mcp/invoke"
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    rng = random.Random(args.seed)
+    run = LoadRun()
+    slots = asyncio.Semaphore(args.max_in_flight)
+    tasks: set[asyncio.Task] = set()
+
+    async def one(query: str) -> None:
+        try:
+            await invoke(client, url, query, run)
+        finally:
+            slots.release()
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        due = 0.0
+        for i, query in enumerate(itertools.cycle(queries)):
+            due += rng.expovariate(args.rps) if args.poisson else 1 / args.rps
+            if due > args.duration:
+                break
+            wait = started + due - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            else:
+                run.lag.append(-wait)
+            if slots.locked():
+                run.dropped += 1
+                continue
+            await slots.acquire()
+            if args.unique:
+                query = f"{query} #{i}"
+            task = asyncio.create_task(one(query))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    settings = {
+        "url": url, "rps": args.rps, "duration": args.duration, "poisson": args.poisson,
+        "unique": args.unique, "max_in_flight": args.max_in_flight, "queries": len(queries),
+    }
+    return run.report(elapsed, settings)
+
+
+def print_report(report: dict) -> None:
+    overall = report["overall"]
+    print(f"\n📈 {overall['requests']} ok in {report['elapsed_s']}s  →  {overall['throughput_rps']} req/s")
+    print(f"   {'agent':<24}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report["agents"].items()) + [("all", overall)]
+    for agent, s in rows:
+        print(
+            f"   {agent:<24}{s['requests']:>9}{s['throughput_rps']:>9}"
+            f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}"
+        )
+    if report["errors"]:
+        print(f"   ❌ errors: {report['errors']}")
+    if report["dropped"]:
+        print(f"   ⚠️  dropped {report['dropped']} arrivals at --max-in-flight")
+    if report["max_send_lag_ms"] > 50:
+        print(f"   ⚠️  generator fell behind schedule by up to {report['max_send_lag_ms']} ms")
+
+
+def main(args: argparse.Namespace) -> None:
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    print(f"🚦 {args.rps} req/s for {args.duration}s against {args.url}")
+    report = asyncio.run(generate(args, queries))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive /mcp/invoke at a target request rate")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Gateway base URL")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send for")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival gaps")
+    parser.add_argument("--queries", help="File with one query per line")
+    parser.add_argument("--unique", action="store_true", help="Make every query distinct")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    main(parser.parse_args())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Stand-in Upstreams
+==================
+Local fakes of the three services the gateway calls, for load tests that
+should not spend Cerebras / Tavily quota or depend on the SkillSocket
+backend:
+
+- **Cerebras** — ``POST /v1/chat/completions``, plain and streaming (SSE).
+  Router prompts get a valid routing decision (chosen by keyword), skill
+  extraction prompts get skill JSON, everything else filler text.
+- **Tavily** — ``POST /search`` with ``max_results`` canned results.
+- **Backend** — ``GET /api/users/match`` and ``GET /api/health``.
+
+Every upstream has its own latency distribution and error rate.  Latency
+specs are ``fixed:MS``, ``uniform:LO,HI``, ``normal:MEAN,SD`` or
+``lognormal:MEDIAN,SIGMA`` (milliseconds); errors answer with a status
+drawn from ``--error-status``.
+
+Point the gateway at them with the printed environment variables:
+
+    CEREBRAS_BASE_URL=http://127.0.0.1:9101/v1
+    TAVILY_BASE_URL=http://127.0.0.1:9102
+    BACKEND_API_URL=http://127.0.0.1:9103
+
+Usage:
+    python benchmarks/stub_upstreams.py
+    python benchmarks/stub_upstreams.py --llm-latency lognormal:400,0.6 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+import uvicorn  # type: ignore[import-untyped]
+from fastapi import FastAPI, Request  # type: ignore[import-untyped]
+from fastapi.responses import JSONResponse, StreamingResponse  # type: ignore[import-untyped]
+
+
+# ── behaviour ────────────────────────────────────────────────────────────────
+
+class Latency:
+    """A latency distribution parsed from a ``kind:params`` spec (milliseconds)."""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency {spec!r}; expected one of {', '.join(self.KINDS)}.")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",")] if params else [0.0]
+        self.rng = rng
+
+    def sample(self) -> float:
+        """One delay in seconds."""
+        p = self.params
+        if self.kind == "uniform":
+            ms = self.rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            ms = self.rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            ms = p[0] * self.rng.lognormvariate(0.0, p[1])
+        else:
+            ms = p[0]
+        return max(ms, 0.0) / 1000
+
+
+class Behaviour:
+    """Latency, error injection and counters for one stand-in upstream."""
+
+    def __init__(self, name: str, latency: str, error_rate: float, error_status: list[int], seed: int):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.latency = Latency(latency, self.rng)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+
+    async def delay(self) -> JSONResponse | None:
+        """Sleep for one latency sample; return an error response if one is due."""
+        self.requests += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            status = self.rng.choice(self.error_status)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            return JSONResponse({"error": f"injected {status} from {self.name} stub"}, status, headers=headers)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "latency": self.latency.spec,
+            "error_rate": self.error_rate,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+# ── Cerebras ─────────────────────────────────────────────────────────────────
+
+FILLER = (
+    "Here is a concise overview with the key points, typical pitfalls and a few "
+    "practical next steps you can take to go further on this topic today."
+).split()
+
+AGENT_KEYWORDS = [
+    ("studygroup", ("study group", "groups", "classmates", "cohort")),
+    ("roadmap", ("roadmap", "learning path", "study plan", "how to learn", "how do i learn")),
+    ("skillmatch", ("teach", "offer", "match me", "skill exchange", "find users", "connect me", "want to learn")),
+]
+
+
+def pick_agent(query: str) -> str:
+    text = query.lower()
+    for agent, keywords in AGENT_KEYWORDS:
+        if any(k in text for k in keywords):
+            return agent
+    return "perplexity"
+
+
+def chat_reply(prompt: str, words: int) -> str:
+    """A reply the gateway can parse for whichever prompt it sent."""
+    if "intelligent router" in prompt:
+        batch = re.findall(r"^(\d+)\. (\".*\")$", prompt, re.MULTILINE)
+        if batch:
+            return json.dumps([
+                {"index": int(i), "agent": pick_agent(json.loads(q)), "input": json.loads(q)}
+                for i, q in batch
+            ])
+        match = re.search(r'User query: "(.*)"', prompt)
+        query = match.group(1) if match else ""
+        return json.dumps({"agent": pick_agent(query), "input": query})
+    if "skillsRequired" in prompt:
+        return json.dumps({"skillsRequired": ["Python"], "skillsOffered": ["React"]})
+    return " ".join(FILLER[i % len(FILLER)] for i in range(words))
+
+
+def create_cerebras_app(behaviour: Behaviour, words: int, token_delay: float) -> FastAPI:
+    app = FastAPI(title="Cerebras stub")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = await behaviour.delay()
+        if error is not None:
+            return error
+        prompt = body["messages"][-1]["content"]
+        text = chat_reply(prompt, words)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(text) // 4 + 1
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if not body.get("stream"):
+            return {
+                "id": f"stub-{behaviour.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def events():
+            for i, word in enumerate(text.split(" ")):
+                delta = {"content": word if i == 0 else " " + word}
+                yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': delta}]})}\n\n"
+                await asyncio.sleep(token_delay)
+            final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return behaviour.stats()
+
+    return app
+
+
+# ── Tavily ───────────────────────────────────────────────────────────────────
+
+def create_tavily_app(behaviour: Behaviour) -> FastAPI:
+    app = FastAPI(title="Tavily stub")
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        error = await behaviour.delay()
+        if error is not None:
+            return error
+        query = body.get("query", "")
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"{query} — source {i + 1}",
+                    "url": f"https://example.com/{i + 1}/{re.sub(r'[^a-z0-9]+', '-', query.lower())}",
+                    "content": f"Result {i + 1} about {query}. " + " ".join(FILLER) * 3,
+                    "score": round(1.0 - i * 0.1, 2),
+                }
+                for i in range(int(body.get("max_results", 5)))
+            ],
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return behaviour.stats()
+
+    return app
+
+
+# ── SkillSocket backend ──────────────────────────────────────────────────────
+
+def create_backend_app(behaviour: Behaviour, users: int) -> FastAPI:
+    app = FastAPI(title="SkillSocket backend stub")
+
+    @app.get("/api/users/match")
+    async def match(required: str = "", offered: str = ""):
+        error = await behaviour.delay()
+        if error is not None:
+            return error
+        return [
+            {
+                "name": f"Stub User {i + 1}",
+                "skillsOffered": [required or "Python"],
+                "skillsRequired": [offered or "React"],
+            }
+            for i in range(users)
+        ]
+
+    @app.get("/api/health")
+    async def health():
+        error = await behaviour.delay()
+        if error is not None:
+            return error
+        return {"status": "ok", "service": "skillsocket-backend-stub"}
+
+    @app.get("/stats")
+    async def stats():
+        return behaviour.stats()
+
+    return app
+
+
+# ── entry point ──────────────────────────────────────────────────────────────
+
+async def serve(apps: list[tuple[FastAPI, int]], host: str) -> None:
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        for app, port in apps
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main(args: argparse.Namespace) -> None:
+    status = [int(s) for s in args.error_status.split(",")]
+
+    def behaviour(name: str, latency: str | None, error_rate: float | None, seed: int) -> Behaviour:
+        return Behaviour(
+            name, latency or args.latency,
+            args.error_rate if error_rate is None else error_rate,
+            status, args.seed + seed,
+        )
+
+    cerebras = behaviour("cerebras", args.llm_latency, args.llm_error_rate, 1)
+    tavily = behaviour("tavily", args.search_latency, args.search_error_rate, 2)
+    backend = behaviour("backend", args.backend_latency, args.backend_error_rate, 3)
+
+    base = f"http://{args.host}"
+    print("🧪 Stand-in upstreams running — point the gateway at them with:")
+    print(f"   CEREBRAS_BASE_URL={base}:{args.cerebras_port}/v1")
+    print(f"   TAVILY_BASE_URL={base}:{args.tavily_port}")
+    print(f"   BACKEND_API_URL={base}:{args.backend_port}")
+    for b in (cerebras, tavily, backend):
+        print(f"   {b.name:<9} latency={b.latency.spec}  error_rate={b.error_rate}")
+
+    asyncio.run(serve([
+        (create_cerebras_app(cerebras, args.words, args.token_delay_ms / 1000), args.cerebras_port),
+        (create_tavily_app(tavily), args.tavily_port),
+        (create_backend_app(backend, args.users), args.backend_port),
+    ], args.host))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local stand-ins for Cerebras, Tavily and the backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--cerebras-port", type=int, default=9101)
+    parser.add_argument("--tavily-port", type=int, default=9102)
+    parser.add_argument("--backend-port", type=int, default=9103)
+    parser.add_argument("--latency", default="lognormal:150,0.5", help="Default latency for every upstream")
+    parser.add_argument("--llm-latency", help="Cerebras latency (time to first token when streaming)")
+    parser.add_argument("--search-latency", help="Tavily latency")
+    parser.add_argument("--backend-latency", help="Backend latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Default fraction of failed requests")
+    parser.add_argument("--llm-error-rate", type=float)
+    parser.add_argument("--search-error-rate", type=float)
+    parser.add_argument("--backend-error-rate", type=float)
+    parser.add_argument("--error-status", default="429,500,503", help="Comma-separated statuses for injected errors")
+    parser.add_argument("--words", type=int, default=120, help="Words in a filler LLM answer")
+    parser.add_argument("--token-delay-ms", type=float, default=15.0, help="Delay between streamed tokens")
+    parser.add_argument("--users", type=int, default=5, help="Users returned by /api/users/match")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -9,6 +9,7 @@ report to ``demo/group_report_output.md``.
 Usage:
     python demo/run_demo.py
     python demo/run_demo.py --method agglomerative --size 3
+    python demo/run_demo.py --assignment local_search
 """
 
 from __future__ import annotations
@@ -22,10 +23,14 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from demo.demo_data import DEMO_STUDENTS, SUBJECTS           # noqa: E402  # type: ignore[import-not-found]
-from agents.study_group_agent import StudyGroupAgent          # noqa: E402  # type: ignore[import-not-found]
+from agents.study_group_agent import (                        # noqa: E402  # type: ignore[import-not-found]
+    StudyGroupAgent,
+    iter_study_group_report,
+    summarize_study_groups,
+)
 
 
-async def main(method: str = "kmeans", target_size: int = 4) -> None:
+async def main(method: str = "kmeans", target_size: int = 4, assignment: str = "greedy") -> None:
     agent = StudyGroupAgent()
 
     payload = {
@@ -33,34 +38,39 @@ async def main(method: str = "kmeans", target_size: int = 4) -> None:
         "subjects": SUBJECTS,
         "target_size": target_size,
         "method": method,
+        "assignment": assignment,
     }
 
-    result = await agent.run(payload)
+    plan = await agent.plan(payload)
+    result = summarize_study_groups(plan)
 
     # ── Pretty-print to terminal ─────────────────────────────────────
     print("\n" + "=" * 70)
     print(result["response"])
-    print("=" * 70)
+    print("=" * 70 + "\n")
 
-    # ── Write the full report to a file ──────────────────────────────
+    # ── Stream the full report to a file (and the terminal) ──────────
     report_path = os.path.join(os.path.dirname(__file__), "group_report_output.md")
     with open(report_path, "w", encoding="utf-8") as f:
-        f.write(result["report"])
+        for chunk in iter_study_group_report(plan):
+            f.write(chunk)
+            sys.stdout.write(chunk)
     print(f"\n✅ Full report written to {report_path}")
 
-    # ── Also print the full report ───────────────────────────────────
-    print("\n" + result["report"])
-
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Study Group Formation Demo")
     parser.add_argument(
-        "--method", choices=["kmeans", "agglomerative"], default="kmeans",
+        "--method", choices=["kmeans", "agglomerative", "minibatch", "auto"], default="kmeans",
         help="Clustering algorithm to use (default: kmeans)",
     )
     parser.add_argument(
         "--size", type=int, default=4,
         help="Target group size (default: 4)",
     )
+    parser.add_argument(
+        "--assignment", choices=["greedy", "local_search"], default="greedy",
+        help="Group assignment engine (default: greedy)",
+    )
     args = parser.parse_args()
-    asyncio.run(main(method=args.method, target_size=args.size))
+    asyncio.run(main(method=args.method, target_size=args.size, assignment=args.assignment))
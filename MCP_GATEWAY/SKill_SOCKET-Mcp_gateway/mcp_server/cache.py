@@ -0,0 +1,94 @@
+"""
+In-Process Caches
+=================
+Bounded LRU cache with per-entry time-to-live, used to short-circuit repeat
+LLM completions.  Counters for hits, misses, expirations and evictions are
+kept so they can be surfaced through ``/mcp/stats``.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after ``ttl`` seconds.
+
+    ``get`` refreshes recency; ``set`` evicts the least-recently-used entry
+    once ``max_size`` is exceeded.  A ``max_size`` of 0 disables the cache.
+    Not thread-safe — intended for use from a single event loop.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry  # type: ignore[misc]
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        if not self.enabled:
+            return
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]  # type: ignore[index]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def completion_cache_from_env() -> TTLCache:
+    """Build the LLM completion cache from ``LLM_CACHE_SIZE`` / ``LLM_CACHE_TTL``."""
+    return TTLCache(
+        max_size=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", "900")),
+    )
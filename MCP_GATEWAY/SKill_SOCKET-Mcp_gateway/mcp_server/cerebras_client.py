@@ -1,36 +1,224 @@
+import asyncio
+import json
+import logging
 import os
+from typing import AsyncIterator
+
 import httpx  # type: ignore[import-untyped]
+
+from mcp_server.cache import TTLCache  # type: ignore[import-not-found]
+from mcp_server.circuit_breaker import UpstreamHealth, guard  # type: ignore[import-not-found]
+from mcp_server.http_pool import UpstreamPool, lease  # type: ignore[import-not-found]
+from mcp_server.metrics import span  # type: ignore[import-not-found]
+from mcp_server.rate_limiter import LLMScheduler, UpstreamBusyError  # type: ignore[import-not-found]
+from mcp_server.singleflight import SingleFlight  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
+
+
 class CerebrasClient:
-    """LLM client that communicates with the Cerebras API."""
+    """LLM client that communicates with the Cerebras API.
+
+    Every request goes through an ``LLMScheduler`` (rate limits, adaptive
+    concurrency, priority lanes, retry with backoff on 429/5xx).  With an
+    ``UpstreamHealth`` it is also guarded by the shared ``cerebras`` circuit
+    breaker, probed through the models endpoint while open.
+    """
 
-    def __init__(self):
+    MODEL = "llama3.1-8b"
+    DEFAULT_MAX_TOKENS = 2000
+
+    def __init__(
+        self,
+        http: UpstreamPool | None = None,
+        cache: TTLCache | None = None,
+        scheduler: LLMScheduler | None = None,
+        health: UpstreamHealth | None = None,
+    ):
         api_key = os.getenv("CEREBRAS_API_KEY")
         if not api_key:
             raise RuntimeError("CEREBRAS_API_KEY is not set in the environment variables.")
-        self.base_url = "https://api.cerebras.ai/v1"
+        self.base_url = os.getenv("CEREBRAS_BASE_URL", "https://api.cerebras.ai/v1").rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
+        self.http = http
+        self.cache = cache
+        self.scheduler = scheduler or LLMScheduler.from_env()
+        self.inflight = SingleFlight("llm")
+        self.breaker = health.breaker("cerebras", probe=self.ping) if health else None
 
-    async def generate_text(self, prompt: str, temperature: float = 0.5) -> str:
-        """Send a prompt to the Cerebras chat-completions endpoint and return the text."""
+    def _payload(
+        self, prompt: str, temperature: float, max_tokens: int, stream: bool = False
+    ) -> dict:
         payload = {
-            "model": "llama3.1-8b",
+            "model": self.MODEL,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": temperature,
-            "max_tokens": 2000,
+            "max_tokens": max_tokens,
         }
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload,
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
-        except httpx.HTTPError as exc:
-            print(f"Cerebras API Error: {exc}")
-            raise RuntimeError("Failed to generate text from Cerebras API.") from exc
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def generate_text(
+        self,
+        prompt: str,
+        temperature: float = 0.5,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        use_cache: bool = True,
+    ) -> str:
+        """Send a prompt to the Cerebras chat-completions endpoint and return the text.
+
+        Completions are served from the response cache (keyed on model,
+        prompt, temperature and max_tokens) when one is configured, and
+        identical concurrent calls share a single upstream request.  Pass
+        ``use_cache=False`` at call sites whose output should vary; such
+        calls are neither cached nor coalesced.
+        """
+        if not use_cache:
+            return await self._complete(prompt, temperature, max_tokens)
+
+        key = (self.MODEL, prompt, temperature, max_tokens)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        async def complete_and_store() -> str:
+            text = await self._complete(prompt, temperature, max_tokens)
+            if self.cache is not None:
+                self.cache.set(key, text)
+            return text
+
+        return await self.inflight.do(key, complete_and_store)
+
+    async def _complete(self, prompt: str, temperature: float, max_tokens: int) -> str:
+        with span("llm"):
+            url = f"{self.base_url}/chat/completions"
+            payload = self._payload(prompt, temperature, max_tokens)
+            reserved = self._estimate_tokens(prompt)
+            attempt = 0
+            try:
+                async with guard(self.breaker), lease(self.http.client(url) if self.http else None, 30.0) as client:
+                    while True:
+                        response = None
+                        async with self.scheduler.slot(reserved):
+                            try:
+                                response = await client.post(
+                                    url, headers=self.headers, json=payload, timeout=30.0
+                                )
+                            except httpx.TransportError as exc:
+                                self.scheduler.observe(None)
+                                if not self.scheduler.should_retry(attempt, exc=exc):
+                                    raise
+                            else:
+                                self.scheduler.observe(response.status_code)
+                                if not self.scheduler.should_retry(attempt, response):
+                                    self._raise_for_status(response)
+                                    data = response.json()
+                                    self._charge_usage(data, reserved)
+                                    return data["choices"][0]["message"]["content"]
+                        await asyncio.sleep(self.scheduler.retry_delay(attempt, response))
+                        attempt += 1
+            except httpx.HTTPError as exc:
+                self.scheduler.failures += 1
+                logger.warning("Cerebras API error", extra={"error": str(exc)})
+                raise RuntimeError("Failed to generate text from Cerebras API.") from exc
+
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        temperature: float = 0.5,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+    ) -> AsyncIterator[str]:
+        """Stream a completion, yielding text deltas as the API produces them.
+
+        Uses the chat-completions ``stream`` option, which answers with
+        Server-Sent Events (``data: {...}`` lines terminated by ``data: [DONE]``).
+        Throttled or failed attempts are retried only before the first token.
+        """
+        with span("llm"):
+            url = f"{self.base_url}/chat/completions"
+            payload = self._payload(prompt, temperature, max_tokens, stream=True)
+            reserved = self._estimate_tokens(prompt)
+            attempt = 0
+            emitted = 0
+            try:
+                async with guard(self.breaker), lease(self.http.client(url) if self.http else None, 30.0) as client:
+                    while True:
+                        failed = None
+                        async with self.scheduler.slot(reserved):
+                            try:
+                                async with client.stream(
+                                    "POST", url, headers=self.headers, json=payload, timeout=30.0
+                                ) as response:
+                                    self.scheduler.observe(response.status_code)
+                                    if self.scheduler.should_retry(attempt, response):
+                                        failed = response
+                                    else:
+                                        self._raise_for_status(response)
+                                        async for delta in self._iter_deltas(response):
+                                            emitted += len(delta)
+                                            yield delta
+                                        self.scheduler.charge_tokens(emitted // 4)
+                                        return
+                            except httpx.TransportError as exc:
+                                self.scheduler.observe(None)
+                                # once tokens have reached the caller a retry would repeat them
+                                if emitted or not self.scheduler.should_retry(attempt, exc=exc):
+                                    raise
+                        await asyncio.sleep(self.scheduler.retry_delay(attempt, failed))
+                        attempt += 1
+            except httpx.HTTPError as exc:
+                self.scheduler.failures += 1
+                logger.warning("Cerebras API error", extra={"error": str(exc)})
+                raise RuntimeError("Failed to stream text from Cerebras API.") from exc
+
+    async def ping(self) -> bool:
+        """Whether the API answers at all (used to probe an open circuit)."""
+        url = f"{self.base_url}/models"
+        async with lease(self.http.client(url) if self.http else None, 5.0) as client:
+            response = await client.get(url, headers=self.headers, timeout=5.0)
+        return response.status_code < 500
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    async def _iter_deltas(response: httpx.Response) -> AsyncIterator[str]:
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            choices = chunk.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+    def _raise_for_status(self, response: httpx.Response) -> None:
+        """Like ``raise_for_status`` but reports persistent throttling distinctly."""
+        if response.status_code == 429:
+            self.scheduler.failures += 1
+            raise UpstreamBusyError(
+                "Cerebras API is rate limiting requests; try again shortly.",
+                retry_after=self.scheduler.retry_after(response),
+            )
+        response.raise_for_status()
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token) for rate-limit reservations."""
+        return len(text) // 4 + 1
+
+    def _charge_usage(self, data: dict, reserved: int) -> None:
+        usage = data.get("usage") or {}
+        total = usage.get("total_tokens")
+        if isinstance(total, int):
+            self.scheduler.charge_tokens(total - reserved)
@@ -0,0 +1,322 @@
+"""
+Upstream Circuit Breakers
+=========================
+One breaker per upstream (Cerebras, Tavily, SkillSocket backend), shared by
+every caller of that upstream, so an outage is noticed once and then
+answered immediately instead of every request waiting out its timeout.
+
+- **closed** — calls go through and their outcomes are kept in a rolling
+  window.  Once at least ``min_calls`` calls ended in the last ``window``
+  seconds and ``failure_ratio`` of them failed, the breaker opens.
+- **open** — calls fail fast with :class:`CircuitOpenError`, an
+  ``UpstreamBusyError``, so the server answers 503 with ``Retry-After``.
+  A background task probes the upstream after ``cooldown`` seconds
+  (doubling up to ``max_cooldown`` while probes fail); a successful probe
+  half-opens the breaker.  Breakers without a probe half-open on the first
+  call after the cooldown.
+- **half-open** — up to ``half_open_calls`` trial calls go through; a
+  success closes the breaker, a failure opens it again.
+
+Transport errors, timeouts and 5xx responses are failures.  Other errors
+(4xx, including the 429s the LLM scheduler deals with) show the upstream
+is reachable and count as successes.
+
+The breaker state doubles as cached health: ``stats()`` reports it without
+touching the network, which replaces per-request connectivity checks.
+
+Configuration (environment variable → default), shared by all breakers:
+
+- ``BREAKER_ENABLED``       → ``1``
+- ``BREAKER_WINDOW``        → 30 s
+- ``BREAKER_MIN_CALLS``     → 5
+- ``BREAKER_FAILURE_RATIO`` → 0.5
+- ``BREAKER_COOLDOWN``      → 5 s
+- ``BREAKER_MAX_COOLDOWN``  → 60 s
+- ``BREAKER_PROBE_TIMEOUT`` → 5 s
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+import httpx  # type: ignore[import-untyped]
+
+from mcp_server.metrics import BREAKER_REJECTED, BREAKER_TRANSITIONS  # type: ignore[import-not-found]
+from mcp_server.rate_limiter import UpstreamBusyError  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+Probe = Callable[[], Awaitable[bool]]
+
+
+class CircuitOpenError(UpstreamBusyError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Whether ``exc`` says the upstream is down (rather than the request was bad)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one upstream.
+
+    Wrap each call in :meth:`guard`; pass ``probe`` (an async callable
+    returning ``True`` when the upstream answers) to recover in the
+    background rather than on a caller's request.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        probe: Probe | None = None,
+        window: float = 30.0,
+        min_calls: int = 5,
+        failure_ratio: float = 0.5,
+        cooldown: float = 5.0,
+        max_cooldown: float = 60.0,
+        probe_timeout: float = 5.0,
+        half_open_calls: int = 1,
+    ):
+        self.name = name
+        self.probe = probe
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._cooldown = cooldown
+        self._retry_at = 0.0
+        self._trials = 0
+        self._probe_task: asyncio.Task | None = None
+        self.last_error: str | None = None
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+
+    @classmethod
+    def from_env(cls, name: str, probe: Probe | None = None) -> "CircuitBreaker":
+        return cls(
+            name,
+            probe=probe,
+            window=float(os.getenv("BREAKER_WINDOW", "30")),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            failure_ratio=float(os.getenv("BREAKER_FAILURE_RATIO", "0.5")),
+            cooldown=float(os.getenv("BREAKER_COOLDOWN", "5")),
+            max_cooldown=float(os.getenv("BREAKER_MAX_COOLDOWN", "60")),
+            probe_timeout=float(os.getenv("BREAKER_PROBE_TIMEOUT", "5")),
+        )
+
+    # ── calls ─────────────────────────────────────────────────────────────
+
+    @contextlib.asynccontextmanager
+    async def guard(self):
+        """Run the enclosed upstream call if the circuit allows it and record its outcome."""
+        trial = self._admit()
+        try:
+            yield
+        except Exception as exc:
+            if is_failure(exc):
+                self._record(False, trial, f"{type(exc).__name__}: {exc}")
+            else:
+                self._record(True, trial)
+            raise
+        except BaseException:
+            # cancelled or abandoned: says nothing about the upstream
+            if trial:
+                self._trials -= 1
+            raise
+        else:
+            self._record(True, trial)
+
+    def _admit(self) -> bool:
+        """Let a call through (returning whether it is a half-open trial) or raise."""
+        now = time.monotonic()
+        if self.state == OPEN and self._probe_task is None and now >= self._retry_at:
+            self._transition(HALF_OPEN)
+        if self.state == CLOSED:
+            return False
+        if self.state == HALF_OPEN and self._trials < self.half_open_calls:
+            self._trials += 1
+            return True
+        self.rejected += 1
+        BREAKER_REJECTED.inc(upstream=self.name)
+        retry_after = max(self._retry_at - now, 1.0)
+        raise CircuitOpenError(
+            f"Upstream {self.name!r} is unavailable (circuit open after repeated connection "
+            f"failures); retrying in {retry_after:.0f}s.",
+            retry_after=retry_after,
+        )
+
+    def _record(self, ok: bool, trial: bool, error: str | None = None) -> None:
+        if not ok:
+            self.last_error = error
+        if trial:
+            self._trials -= 1
+            if self.state == HALF_OPEN:
+                if ok:
+                    self._close()
+                else:
+                    self._open()
+            return
+        if self.state != CLOSED:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._failures += not ok
+        self._prune(now)
+        calls = len(self._outcomes)
+        if not ok and calls >= self.min_calls and self._failures >= calls * self.failure_ratio:
+            self._open()
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, ok = self._outcomes.popleft()
+            self._failures -= not ok
+
+    # ── transitions ───────────────────────────────────────────────────────
+
+    def _open(self) -> None:
+        if self.state == HALF_OPEN:
+            self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+        self._retry_at = time.monotonic() + self._cooldown
+        self._transition(OPEN)
+        self.opened += 1
+        logger.warning(
+            "Circuit opened",
+            extra={"upstream": self.name, "cooldown_s": self._cooldown, "error": self.last_error},
+        )
+        if self.probe is not None and self._probe_task is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return  # no event loop: fall back to a trial call after the cooldown
+            # a fresh context, so probes are not logged or traced as the
+            # request that happened to open the circuit
+            self._probe_task = contextvars.Context().run(loop.create_task, self._probe_loop())
+
+    def _close(self) -> None:
+        self._outcomes.clear()
+        self._failures = 0
+        self._cooldown = self.base_cooldown
+        self._transition(CLOSED)
+        logger.info("Circuit closed", extra={"upstream": self.name})
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        BREAKER_TRANSITIONS.inc(upstream=self.name, state=state)
+
+    async def _probe_loop(self) -> None:
+        try:
+            while self.state == OPEN:
+                await asyncio.sleep(max(self._retry_at - time.monotonic(), 0.0))
+                self.probes += 1
+                try:
+                    healthy = bool(await asyncio.wait_for(self.probe(), self.probe_timeout))
+                except Exception as exc:
+                    healthy = False
+                    self.last_error = f"probe: {type(exc).__name__}: {exc}"
+                if healthy:
+                    self._transition(HALF_OPEN)
+                    return
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self._retry_at = time.monotonic() + self._cooldown
+        finally:
+            self._probe_task = None
+
+    async def aclose(self) -> None:
+        """Stop a running background probe."""
+        task = self._probe_task
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    # ── health ────────────────────────────────────────────────────────────
+
+    @property
+    def healthy(self) -> bool:
+        return self.state == CLOSED
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self._prune(now)
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failures": self._failures,
+            "failure_ratio": round(self._failures / calls, 3) if calls else 0.0,
+            "retry_in_s": round(max(self._retry_at - now, 0.0), 1) if self.state == OPEN else None,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "probes": self.probes,
+            "last_error": self.last_error,
+        }
+
+
+@contextlib.asynccontextmanager
+async def guard(breaker: CircuitBreaker | None):
+    """``breaker.guard()``, or nothing when the caller has no breaker."""
+    if breaker is None:
+        yield
+        return
+    async with breaker.guard():
+        yield
+
+
+class UpstreamHealth:
+    """The circuit breakers of every upstream, by name.
+
+    Created by the ``server.py`` lifespan; clients register their upstream
+    (with a probe) and get back the shared breaker, or ``None`` when
+    ``BREAKER_ENABLED=0``.
+    """
+
+    def __init__(self, enabled: bool | None = None):
+        if enabled is None:
+            enabled = os.getenv("BREAKER_ENABLED", "1") == "1"
+        self.enabled = enabled
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, name: str, probe: Probe | None = None) -> CircuitBreaker | None:
+        if not self.enabled:
+            return None
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker.from_env(name, probe)
+        elif probe is not None and breaker.probe is None:
+            breaker.probe = probe
+        return breaker
+
+    def summary(self) -> dict[str, str]:
+        """State of every upstream, for the health endpoint."""
+        return {name: b.state for name, b in self.breakers.items()}
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "breakers": {name: b.stats() for name, b in self.breakers.items()},
+        }
+
+    async def aclose(self) -> None:
+        for breaker in self.breakers.values():
+            await breaker.aclose()
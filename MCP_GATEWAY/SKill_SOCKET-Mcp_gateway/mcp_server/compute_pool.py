@@ -0,0 +1,123 @@
+"""
+Compute Pool
+============
+Runs CPU-bound work (study-group clustering, report rendering) outside the
+event loop so a large cohort does not stall every other request served by
+the same worker.
+
+- ``kind="process"`` (default) uses a :class:`ProcessPoolExecutor` with the
+  ``spawn`` start method — forking a process that already runs an event
+  loop and helper threads is not safe.  Job functions must be importable
+  module-level functions and their arguments picklable; pass NumPy arrays
+  rather than lists of dicts to keep the pickled payload small.
+- ``kind="thread"`` uses a :class:`ThreadPoolExecutor`; NumPy / sklearn
+  release the GIL for most of the heavy lifting.
+
+Every job is bounded by ``timeout`` seconds.  A running process cannot be
+interrupted, so on timeout the process pool is replaced: callers get a fresh
+pool immediately, and the old one finishes its in-flight jobs and exits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+
+class ComputePool:
+    """Lifespan-managed executor for CPU-bound jobs."""
+
+    def __init__(self, workers: int | None = None, timeout: float = 60.0, kind: str = "process"):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown compute pool kind: {kind!r}")
+        self.kind = kind
+        self.workers = max(1, workers or min(4, os.cpu_count() or 1))
+        self.timeout = timeout
+        self._executor: Executor = self._new_executor()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.in_flight = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ComputePool":
+        workers = int(os.getenv("COMPUTE_WORKERS", "0"))
+        return cls(
+            workers=workers or None,
+            timeout=float(os.getenv("COMPUTE_TIMEOUT", "60")),
+            kind=os.getenv("COMPUTE_POOL", "process"),
+        )
+
+    def _new_executor(self) -> Executor:
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compute")
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` in the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        self.submitted += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(executor, fn, *args), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._recycle(executor)
+            raise RuntimeError(f"Compute job timed out after {self.timeout:g}s")
+        except BrokenProcessPool as exc:
+            self.failed += 1
+            self._recycle(executor)
+            raise RuntimeError(f"Compute worker crashed: {exc}")
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.completed += 1
+        self._total_ms += elapsed_ms
+        self._max_ms = max(self._max_ms, elapsed_ms)
+        return result
+
+    def _recycle(self, executor: Executor) -> None:
+        """Swap in a fresh process pool; the old one drains in the background."""
+        if self.kind != "process" or executor is not self._executor:
+            return
+        self.recycled += 1
+        self._executor = self._new_executor()
+        executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "timeout": self.timeout,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self._total_ms / self.completed, 2) if self.completed else 0.0,
+            "max_ms": round(self._max_ms, 2),
+        }
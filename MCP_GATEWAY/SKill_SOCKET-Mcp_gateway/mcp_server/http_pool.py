@@ -0,0 +1,209 @@
+"""
+Upstream HTTP Pool
+==================
+One long-lived ``httpx.AsyncClient`` per upstream host (Cerebras, Tavily,
+SkillSocket backend) so that repeat calls reuse keep-alive connections
+instead of paying a fresh TCP+TLS handshake every time.
+
+The pool is created and closed by the ``server.py`` lifespan and injected
+into the LLM client, the tool registry and the agents.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx  # type: ignore[import-untyped]
+
+from mcp_server.metrics import UPSTREAM_RESPONSES, UPSTREAM_SECONDS, child_traceparent  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # type: ignore[import-not-found]  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class UpstreamPool:
+    """Per-host pooled ``httpx.AsyncClient`` instances with usage statistics.
+
+    Configuration (constructor argument → environment variable → default):
+
+    - ``max_connections``       → ``UPSTREAM_MAX_CONNECTIONS``       → 100
+    - ``max_keepalive``         → ``UPSTREAM_MAX_KEEPALIVE``         → 20
+    - ``keepalive_expiry``      → ``UPSTREAM_KEEPALIVE_EXPIRY``      → 30 s
+    - ``connect_timeout``       → ``UPSTREAM_CONNECT_TIMEOUT``       → 5 s
+    - ``timeout``               → ``UPSTREAM_TIMEOUT``               → 30 s
+    - ``http2``                 → ``UPSTREAM_HTTP2`` (``1``/``0``)   → off
+
+    HTTP/2 is only enabled when the optional ``h2`` package is installed.
+    Individual requests may still pass their own ``timeout=`` to override
+    the pool default.
+    """
+
+    def __init__(
+        self,
+        max_connections: int | None = None,
+        max_keepalive: int | None = None,
+        keepalive_expiry: float | None = None,
+        connect_timeout: float | None = None,
+        timeout: float | None = None,
+        http2: bool | None = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or _env_int("UPSTREAM_MAX_CONNECTIONS", 100),
+            max_keepalive_connections=max_keepalive or _env_int("UPSTREAM_MAX_KEEPALIVE", 20),
+            keepalive_expiry=keepalive_expiry or _env_float("UPSTREAM_KEEPALIVE_EXPIRY", 30.0),
+        )
+        self.timeout = httpx.Timeout(
+            timeout or _env_float("UPSTREAM_TIMEOUT", 30.0),
+            connect=connect_timeout or _env_float("UPSTREAM_CONNECT_TIMEOUT", 5.0),
+        )
+        if http2 is None:
+            http2 = os.getenv("UPSTREAM_HTTP2", "0") == "1"
+        if http2 and not _http2_available():
+            logger.warning("UPSTREAM_HTTP2 requested but the 'h2' package is not installed — using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._stats: dict[str, dict] = {}
+        self._closed = False
+
+    # ── client access ─────────────────────────────────────────────────────
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """Return the shared client for the host of ``url``, creating it on first use."""
+        if self._closed:
+            raise RuntimeError("UpstreamPool is closed.")
+        key = self._host_key(url)
+        client = self._clients.get(key)
+        if client is None:
+            stats = self._stats.setdefault(key, {
+                "requests": 0,
+                "errors": 0,
+                "in_flight": 0,
+                "total_time_ms": 0.0,
+            })
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=_CountingTransport(
+                    key,
+                    stats,
+                    limits=self.limits,
+                    http2=self.http2,
+                ),
+            )
+            self._clients[key] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pooled client.  Safe to call more than once."""
+        self._closed = True
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    # ── statistics ────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        """Return per-host request counters and connection-pool occupancy."""
+        hosts: dict[str, dict] = {}
+        for key, raw in self._stats.items():
+            entry = dict(raw)
+            entry["total_time_ms"] = round(entry["total_time_ms"], 2)
+            entry["avg_time_ms"] = (
+                round(raw["total_time_ms"] / raw["requests"], 2) if raw["requests"] else 0.0
+            )
+            entry.update(self._connection_counts(self._clients.get(key)))
+            hosts[key] = entry
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "hosts": hosts,
+        }
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @staticmethod
+    def _connection_counts(client: httpx.AsyncClient | None) -> dict:
+        """Best-effort introspection of the underlying httpcore pool."""
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"connections": 0, "idle_connections": 0}
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"connections": len(connections), "idle_connections": idle}
+
+
+class _CountingTransport(httpx.AsyncHTTPTransport):
+    """HTTP transport that records request counts and latency for one host.
+
+    Also feeds the upstream metrics and, when a trace is active, adds a
+    ``traceparent`` header for the call.
+    """
+
+    def __init__(self, host: str, stats: dict, **kwargs):
+        super().__init__(**kwargs)
+        self._host = host
+        self._host_stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self._host_stats
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        traceparent = child_traceparent()
+        if traceparent is not None:
+            request.headers["traceparent"] = traceparent
+        started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            stats["errors"] += 1
+            UPSTREAM_RESPONSES.inc(upstream=self._host, status="error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats["in_flight"] -= 1
+            stats["total_time_ms"] += elapsed * 1000
+            UPSTREAM_SECONDS.observe(elapsed, upstream=self._host)
+        UPSTREAM_RESPONSES.inc(upstream=self._host, status=response.status_code)
+        if response.status_code >= 400:
+            stats["errors"] += 1
+        return response
+
+
+@asynccontextmanager
+async def lease(client: httpx.AsyncClient | None, timeout: float):
+    """Yield ``client`` if given, otherwise a throwaway client closed on exit.
+
+    Lets tool functions keep working when called outside the server (demo
+    scripts, ad-hoc use) without a pool.
+    """
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=timeout) as ephemeral:
+        yield ephemeral
@@ -0,0 +1,211 @@
+"""
+Fast-Path Intent Classifier
+===========================
+In-process keyword / n-gram scorer that picks an agent for clear-cut queries
+without an LLM round trip.  Ambiguous queries are left to the LLM router,
+whose decisions are fed back through :meth:`IntentClassifier.observe` so the
+classifier picks up new vocabulary from live traffic.
+
+Scoring
+-------
+- **Seed phrases** are the quoted trigger phrases in the router's agent
+  descriptions (``"roadmap for Y"`` → ``roadmap for``) plus a few extra cues
+  per agent.  Each phrase found in the query adds its weight to that agent.
+- **Learned n-grams** (unigrams and bigrams) are counted per agent from LLM
+  decisions.  Once an n-gram has been seen ``min_support`` times and at
+  least ``purity`` of those were the same agent, it adds ``learned_weight``.
+
+A query is dispatched locally only when the best agent scores at least
+``min_score`` *and* leads the runner-up by at least ``margin``.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import Counter, defaultdict
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#.]+")
+_PLACEHOLDER_RE = re.compile(r"\s+\b[A-Z]\b$")
+
+# Too common to carry intent on their own; never learned as unigrams.
+_STOPWORDS = frozenset(
+    "a an the and or of to for in on at is are be i me my you it this that "
+    "with about what how can do please".split()
+)
+
+# Cues not spelled out in the router descriptions.
+EXTRA_CUES: dict[str, dict[str, float]] = {
+    "perplexity": {
+        "what is": 2.5, "what are": 2.5, "who is": 2.5, "who was": 2.5,
+        "when did": 2.5, "when was": 2.5, "why does": 2.0, "why is": 2.0,
+        "explain": 1.5, "define": 2.5, "definition of": 2.5, "difference between": 2.5,
+        "latest": 2.0, "news": 2.0, "current": 1.0, "how does": 2.0,
+    },
+    "roadmap": {
+        "roadmap": 3.0, "learning plan": 3.0, "how do i learn": 3.0,
+        "how can i learn": 3.0, "where to start": 2.0, "curriculum": 2.5,
+        "path to becoming": 3.0, "step by step": 1.5,
+    },
+    "skillmatch": {
+        "i can teach": 3.0, "i know": 1.5, "teach me": 1.5, "looking for someone": 2.5,
+        "find someone": 2.5, "exchange": 1.5, "mentor": 1.5, "partner": 1.0,
+    },
+    "studygroup": {
+        "study groups": 3.0, "form groups": 3.0, "form teams": 3.0, "make groups": 3.0,
+        "group the students": 3.0, "cluster students": 3.0, "students into": 2.0,
+        "teams of": 1.5, "groups of": 1.5,
+    },
+}
+
+_ROADMAP_TOPIC_RE = re.compile(
+    r"(?:roadmap|learning path|learning plan|study plan|curriculum)\s+(?:for|to|on|of|in)\s+(.+)"
+    r"|how (?:to|do i|can i|should i) (?:learn|master|get started with|start)\s+(.+)",
+    re.IGNORECASE,
+)
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _ngrams(tokens: list[str]) -> set[str]:
+    grams = {t for t in tokens if t not in _STOPWORDS}
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return grams
+
+
+class IntentClassifier:
+    """Weighted phrase scorer with online n-gram learning."""
+
+    def __init__(
+        self,
+        phrases: dict[str, dict[str, float]],
+        min_score: float | None = None,
+        margin: float | None = None,
+        min_support: int = 5,
+        purity: float = 0.9,
+        learned_weight: float = 1.0,
+        max_vocabulary: int = 50_000,
+    ):
+        self.agents = list(phrases)
+        self.min_score = min_score if min_score is not None else float(os.getenv("ROUTER_FASTPATH_MIN_SCORE", "2.5"))
+        self.margin = margin if margin is not None else float(os.getenv("ROUTER_FASTPATH_MARGIN", "2.0"))
+        self.min_support = min_support
+        self.purity = purity
+        self.learned_weight = learned_weight
+        self.max_vocabulary = max_vocabulary
+
+        # (pattern, agent, weight) triples; phrases match on word boundaries
+        self._patterns: list[tuple[re.Pattern, str, float]] = [
+            (re.compile(rf"(?<![a-z0-9]){re.escape(p)}(?![a-z0-9])"), agent, w)
+            for agent, table in phrases.items()
+            for p, w in table.items()
+        ]
+        self._counts: dict[str, Counter] = defaultdict(Counter)
+
+        self.fast_path = 0
+        self.deferred = 0
+        self.observed = 0
+
+    @classmethod
+    def from_descriptions(cls, descriptions: str, **kwargs) -> "IntentClassifier":
+        """Build a classifier from router descriptions of the form
+        ``- name: text ... "phrase one", "phrase X" ...`` plus :data:`EXTRA_CUES`.
+        """
+        phrases: dict[str, dict[str, float]] = {}
+        for line in descriptions.splitlines():
+            m = re.match(r"\s*-\s*(\w+):(.*)", line)
+            if not m:
+                continue
+            agent, text = m.group(1), m.group(2)
+            table = phrases.setdefault(agent, {})
+            for raw in re.findall(r'"([^"]+)"', text):
+                phrase = _PLACEHOLDER_RE.sub("", raw).strip().lower()
+                if phrase:
+                    # Multi-word triggers are strong; single words less so.
+                    table[phrase] = 3.0 if " " in phrase else 2.0
+        for agent, cues in EXTRA_CUES.items():
+            if agent in phrases:
+                for phrase, weight in cues.items():
+                    phrases[agent].setdefault(phrase, weight)
+        return cls(phrases, **kwargs)
+
+    # ── classification ────────────────────────────────────────────────────
+
+    def scores(self, query: str) -> dict[str, float]:
+        lower = " ".join(_tokens(query))
+        scores = dict.fromkeys(self.agents, 0.0)
+        for pattern, agent, weight in self._patterns:
+            if pattern.search(lower):
+                scores[agent] += weight
+        for gram in _ngrams(_tokens(query)):
+            agent = self._learned_agent(gram)
+            if agent is not None:
+                scores[agent] += self.learned_weight
+        return scores
+
+    def classify(self, query: str) -> tuple[str | None, float, dict[str, float]]:
+        """Return ``(agent, confidence, scores)``.
+
+        ``agent`` is ``None`` when the query is ambiguous and should go to
+        the LLM router.  ``confidence`` is the lead over the runner-up as a
+        fraction of the top score (0 – 1).
+        """
+        scores = self.scores(query)
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        (best, top), second = ranked[0], (ranked[1][1] if len(ranked) > 1 else 0.0)
+        confidence = (top - second) / top if top > 0 else 0.0
+        if top >= self.min_score and top - second >= self.margin:
+            self.fast_path += 1
+            return best, round(confidence, 3), scores
+        self.deferred += 1
+        return None, round(confidence, 3), scores
+
+    @staticmethod
+    def agent_input(agent: str, query: str) -> str:
+        """Derive the agent input the LLM router would produce for ``query``.
+
+        For roadmaps this strips the trigger phrase so the agent receives
+        just the topic; other agents take the query unchanged.
+        """
+        if agent == "roadmap":
+            m = _ROADMAP_TOPIC_RE.search(query)
+            if m:
+                topic = (m.group(1) or m.group(2)).strip().rstrip("?.! ")
+                if topic:
+                    return topic
+        return query
+
+    # ── learning ──────────────────────────────────────────────────────────
+
+    def observe(self, query: str, agent: str) -> None:
+        """Record an authoritative (LLM) routing decision for ``query``."""
+        if agent not in self.agents:
+            return
+        self.observed += 1
+        counts = self._counts
+        for gram in _ngrams(_tokens(query)):
+            if gram not in counts and len(counts) >= self.max_vocabulary:
+                continue
+            counts[gram][agent] += 1
+
+    def _learned_agent(self, gram: str) -> str | None:
+        counter = self._counts.get(gram)
+        if not counter:
+            return None
+        total = sum(counter.values())
+        if total < self.min_support:
+            return None
+        agent, hits = counter.most_common(1)[0]
+        return agent if hits / total >= self.purity else None
+
+    def stats(self) -> dict:
+        decided = self.fast_path + self.deferred
+        return {
+            "fast_path": self.fast_path,
+            "deferred_to_llm": self.deferred,
+            "fast_path_rate": round(self.fast_path / decided, 4) if decided else 0.0,
+            "observed_decisions": self.observed,
+            "learned_vocabulary": len(self._counts),
+        }
@@ -0,0 +1,200 @@
+"""
+Structured Logging
+==================
+Non-blocking logging for the gateway.  Log calls only put a record on a
+bounded in-memory queue; a background thread formats it and writes it to
+stdout, so a slow log pipe never stalls the event loop.
+
+Every record carries the ``request_id`` of the HTTP request it belongs to
+(set by the server middleware) and the agent it ran under, plus any
+``extra={...}`` fields passed to the log call.
+
+Configuration (environment variable → default):
+
+- ``LOG_LEVEL``        → ``INFO`` — root level
+- ``LOG_LEVELS``       → ``""`` — per-module overrides, e.g.
+  ``mcp_server.router=DEBUG,tools.db_tool=WARNING`` (``httpx`` and
+  ``httpcore`` default to WARNING and INFO)
+- ``LOG_FORMAT``       → ``json`` — or ``text`` for local development
+- ``LOG_QUEUE_SIZE``   → ``10000`` — records buffered for the writer thread
+- ``LOG_DEBUG_SAMPLE`` → ``1.0`` — fraction of DEBUG records kept
+- ``LOG_SHED_AT``      → ``0.8`` — once the queue is this full, records
+  below WARNING are dropped; when it is completely full every new record is
+  dropped.  Dropped records are counted in :func:`logging_stats`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+from mcp_server.metrics import current_agent  # type: ignore[import-not-found]
+
+request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+
+# attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# chatty libraries start quieter than the root level (LOG_LEVELS overrides)
+_LIBRARY_LEVELS = {"httpx": "WARNING", "httpcore": "INFO"}
+
+_listener: logging.handlers.QueueListener | None = None
+_handler: "SheddingQueueHandler | None" = None
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request id and agent (in the caller's context)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        agent = current_agent.get()
+        record.agent = None if agent == "none" else agent
+        return True
+
+
+class SheddingQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` that samples DEBUG records and never blocks.
+
+    Records are dropped instead of waiting for room: below WARNING once the
+    queue passes ``shed_at`` of its capacity, and everything once it is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue, debug_sample: float = 1.0, shed_at: float = 0.8):
+        super().__init__(log_queue)
+        self.debug_sample = debug_sample
+        self.high_water = max(1, int(log_queue.maxsize * shed_at)) if log_queue.maxsize else 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.addFilter(ContextFilter())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno < logging.INFO and self.debug_sample < 1.0 and random.random() >= self.debug_sample:
+            self.sampled_out += 1
+            return
+        if self.high_water and record.levelno < logging.WARNING and self.queue.qsize() >= self.high_water:
+            self.dropped += 1
+            return
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put_nowait(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message (and traceback) now, but leave the rest to the
+        # writer thread's formatter.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the request id and extra fields appended."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        extras = " ".join(
+            f"{key}={value}" for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS and key != "request_id" and value is not None
+        )
+        rid = f" [{record.request_id[:8]}]" if getattr(record, "request_id", None) else ""
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} {record.name}{rid}: {record.getMessage()}"
+        if extras:
+            line += f"  {extras}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _parse_levels(spec: str) -> dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(stream=None) -> None:
+    """Route all logging through the queue and start the writer thread.
+
+    Safe to call more than once; later calls are ignored until
+    :func:`shutdown_logging`.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    _handler = SheddingQueueHandler(
+        log_queue,
+        debug_sample=float(os.getenv("LOG_DEBUG_SAMPLE", "1.0")),
+        shed_at=float(os.getenv("LOG_SHED_AT", "0.8")),
+    )
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json") == "text" else JsonFormatter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    levels = {**_LIBRARY_LEVELS, **_parse_levels(os.getenv("LOG_LEVELS", ""))}
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    if _handler is None:
+        return {"configured": False}
+    return {
+        "configured": _listener is not None,
+        "queued": _handler.queue.qsize(),
+        "capacity": _handler.queue.maxsize,
+        "dropped": _handler.dropped,
+        "sampled_out": _handler.sampled_out,
+    }
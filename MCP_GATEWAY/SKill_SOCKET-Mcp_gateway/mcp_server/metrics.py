@@ -0,0 +1,277 @@
+"""
+Gateway Metrics
+===============
+In-process latency histograms and counters, rendered at ``/metrics`` in the
+Prometheus text exposition format (no client library required).
+
+Timing spans
+------------
+``span(stage)`` times a block into ``gateway_stage_duration_seconds``
+labelled by agent and stage.  The agent comes from ``agent_scope`` (set by
+the router around each agent run), so LLM and tool calls made on an agent's
+behalf are attributed to it.  Stages:
+
+- ``route_fast`` / ``route_llm`` — classifier and LLM routing decisions
+  (labelled with the chosen agent, or ``router`` when undecided)
+- ``agent`` — a whole agent run
+- ``llm`` — one Cerebras completion (streamed ones until the last token)
+- ``tool:<name>`` — one tool call (``tool:web_search`` …)
+- ``clustering`` / ``report`` — study-group formation and report rendering
+
+A span that raises also counts ``gateway_stage_errors_total``.
+
+Trace context
+-------------
+With ``TRACE_PROPAGATION=1`` the server accepts a W3C ``traceparent``
+header (or starts a trace), returns its own span in the response's
+``traceparent`` header and forwards child spans to every upstream call.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import re
+import secrets
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+current_agent: contextvars.ContextVar[str] = contextvars.ContextVar("current_agent", default="none")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labelnames), 0.0)
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(tuple(str(labels[n]) for n in self.labelnames), ()))
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# ── gateway metrics ──────────────────────────────────────────────────────────
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "gateway_stage_duration_seconds", "Time spent per pipeline stage.", ("agent", "stage"),
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "gateway_stage_errors_total", "Pipeline stages that raised, by exception type.", ("agent", "stage", "error"),
+)
+ROUTER_FALLBACKS = REGISTRY.counter(
+    "gateway_router_fallbacks_total", "Queries answered by the perplexity fallback.", ("agent", "error"),
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "gateway_http_request_duration_seconds",
+    "Gateway HTTP request latency (until the last response body chunk is sent).",
+    ("method", "route", "status"),
+)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "gateway_upstream_request_duration_seconds",
+    "Latency of calls to upstream hosts (until the response headers).",
+    ("upstream",),
+)
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "gateway_upstream_responses_total",
+    'Upstream responses by status code ("error" for transport failures).',
+    ("upstream", "status"),
+)
+BREAKER_TRANSITIONS = REGISTRY.counter(
+    "gateway_circuit_transitions_total", "Circuit breaker state changes, by the state entered.", ("upstream", "state"),
+)
+BREAKER_REJECTED = REGISTRY.counter(
+    "gateway_circuit_rejected_total", "Upstream calls failed fast by an open circuit.", ("upstream",),
+)
+
+
+class Span:
+    """An in-progress timing span; ``agent`` may be set before it ends."""
+
+    def __init__(self, stage: str, agent: str):
+        self.stage = stage
+        self.agent = agent
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def span(stage: str, agent: str | None = None):
+    """Time the enclosed block as ``stage`` of the current (or given) agent."""
+    current = Span(stage, agent or current_agent.get())
+    try:
+        yield current
+    except Exception as exc:
+        STAGE_ERRORS.inc(agent=current.agent, stage=stage, error=type(exc).__name__)
+        raise
+    finally:
+        STAGE_SECONDS.observe(current.elapsed, agent=current.agent, stage=stage)
+
+
+def observe_stage(stage: str, seconds: float, agent: str | None = None) -> None:
+    """Record a stage timed elsewhere (e.g. in a compute worker)."""
+    STAGE_SECONDS.observe(seconds, agent=agent or current_agent.get(), stage=stage)
+
+
+@contextmanager
+def agent_scope(agent: str):
+    """Attribute spans in the enclosed code (and tasks it starts) to ``agent``."""
+    token = current_agent.set(agent)
+    try:
+        yield
+    finally:
+        current_agent.reset(token)
+
+
+# ── trace context ────────────────────────────────────────────────────────────
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+trace_context: contextvars.ContextVar[tuple[str, str, str] | None] = contextvars.ContextVar(
+    "trace_context", default=None
+)
+
+
+def start_trace(traceparent: str | None) -> tuple[str, str, str]:
+    """Continue the caller's trace (or start one) with a new server span.
+
+    Returns ``(trace_id, span_id, flags)``; an invalid or all-zero
+    ``traceparent`` starts a fresh trace.
+    """
+    match = _TRACEPARENT.match((traceparent or "").strip().lower())
+    if match and match.group(1) != "0" * 32 and match.group(2) != "0" * 16:
+        trace_id, flags = match.group(1), match.group(3)
+    else:
+        trace_id, flags = secrets.token_hex(16), "01"
+    return trace_id, secrets.token_hex(8), flags
+
+
+def format_traceparent(trace_id: str, span_id: str, flags: str) -> str:
+    return f"00-{trace_id}-{span_id}-{flags}"
+
+
+def child_traceparent() -> str | None:
+    """``traceparent`` for an outgoing call in the current trace, if any."""
+    context = trace_context.get()
+    if context is None:
+        return None
+    trace_id, _, flags = context
+    return format_traceparent(trace_id, secrets.token_hex(8), flags)
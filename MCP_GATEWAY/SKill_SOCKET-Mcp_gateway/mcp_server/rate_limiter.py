@@ -0,0 +1,287 @@
+"""
+LLM Request Scheduler
+=====================
+Client-side admission control for the Cerebras API:
+
+- **Token buckets** for requests-per-minute and tokens-per-minute.
+- **AIMD concurrency limit** — the in-flight limit grows by ~1 per window of
+  successful calls and halves when the provider throttles us (429/503).
+- **Priority lanes** — when the limit is saturated, ``interactive`` callers
+  are admitted before ``batch`` callers.  The lane is taken from the
+  :data:`request_priority` context variable (see :func:`priority_scope`).
+- **Retries** with full-jitter exponential backoff that honour
+  ``Retry-After``.
+
+Queue depth, wait times, retries and throttling are exposed via ``stats()``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx  # type: ignore[import-untyped]
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUS = frozenset({429, 503})
+
+request_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "request_priority", default="interactive"
+)
+
+
+@contextmanager
+def priority_scope(priority: str):
+    """Run the enclosed code (and tasks it creates) in the given priority lane."""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class UpstreamBusyError(RuntimeError):
+    """Raised when the provider keeps throttling us after every retry."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate_per_minute``.
+
+    ``charge`` may push the balance negative to account for usage that is
+    only known after the fact (e.g. completion tokens); later callers then
+    wait for the debt to be repaid.  A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        if not self.enabled:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def charge(self, amount: float) -> None:
+        if self.enabled:
+            self._refill()
+            self.tokens -= amount
+
+
+class AdaptiveLimiter:
+    """AIMD in-flight limit with priority-ordered admission."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease_interval: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+
+    def queue_depth(self, priority: int | None = None) -> int:
+        return sum(
+            1 for p, _, fut in self._waiters
+            if not fut.done() and (priority is None or p == priority)
+        )
+
+    async def acquire(self, priority: int) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # slot was granted just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.in_flight += 1
+            fut.set_result(None)
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+        self._wake()
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= self.decrease_interval:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+
+class LLMScheduler:
+    """Admission control, adaptive concurrency and retry policy for LLM calls."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.limiter = AdaptiveLimiter(initial_concurrency, min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lanes = {
+            name: {"admitted": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0}
+            for name in PRIORITIES
+        }
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            requests_per_minute=float(os.getenv("CEREBRAS_RPM", "0")),
+            tokens_per_minute=float(os.getenv("CEREBRAS_TPM", "0")),
+            initial_concurrency=int(os.getenv("LLM_INITIAL_CONCURRENCY", "8")),
+            min_concurrency=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+            backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "20")),
+        )
+
+    # ── admission ─────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        """Hold one in-flight slot (in the caller's priority lane) for a request."""
+        lane = request_priority.get()
+        if lane not in PRIORITIES:
+            lane = "interactive"
+        started = time.perf_counter()
+        await self.limiter.acquire(PRIORITIES[lane])
+        try:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(tokens)
+            self._record_wait(lane, (time.perf_counter() - started) * 1000)
+            yield
+        finally:
+            self.limiter.release()
+
+    def charge_tokens(self, tokens: int) -> None:
+        """Account for tokens used beyond what was reserved in :meth:`slot`."""
+        if tokens > 0:
+            self.token_bucket.charge(tokens)
+
+    # ── outcome / retry policy ────────────────────────────────────────────
+
+    def observe(self, status_code: int | None) -> None:
+        """Feed a response status (``None`` for a transport error) to the AIMD limit."""
+        if status_code in THROTTLE_STATUS:
+            self.throttled += 1
+            self.limiter.on_throttle()
+        elif status_code is not None and status_code < 400:
+            self.limiter.on_success()
+
+    def should_retry(
+        self, attempt: int, response: httpx.Response | None = None, exc: Exception | None = None
+    ) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if exc is not None:
+            return isinstance(exc, httpx.TransportError)
+        return response is not None and response.status_code in RETRYABLE_STATUS
+
+    def retry_delay(self, attempt: int, response: httpx.Response | None = None) -> float:
+        """Full-jitter exponential backoff, or the server's ``Retry-After`` if longer."""
+        self.retries += 1
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = self.retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def retry_after(response: httpx.Response | None) -> float | None:
+        value = response.headers.get("retry-after") if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    # ── metrics ───────────────────────────────────────────────────────────
+
+    def _record_wait(self, lane: str, waited_ms: float) -> None:
+        stats = self._lanes[lane]
+        stats["admitted"] += 1
+        stats["wait_total_ms"] += waited_ms
+        stats["wait_max_ms"] = max(stats["wait_max_ms"], waited_ms)
+
+    def stats(self) -> dict:
+        lanes = {}
+        for name, raw in self._lanes.items():
+            lanes[name] = {
+                "queue_depth": self.limiter.queue_depth(PRIORITIES[name]),
+                "admitted": raw["admitted"],
+                "avg_wait_ms": round(raw["wait_total_ms"] / raw["admitted"], 2) if raw["admitted"] else 0.0,
+                "max_wait_ms": round(raw["wait_max_ms"], 2),
+            }
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "queue_depth": self.limiter.queue_depth(),
+            "lanes": lanes,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+        }
@@ -1,35 +1,234 @@
+import asyncio
 import json
+import logging
+import os
 import re
+from typing import AsyncIterator
+
+from mcp_server.intent_classifier import IntentClassifier  # type: ignore[import-not-found]
+from mcp_server.metrics import ROUTER_FALLBACKS, agent_scope, span  # type: ignore[import-not-found]
+from mcp_server.rate_limiter import priority_scope  # type: ignore[import-not-found]
+from mcp_server.singleflight import SingleFlight, normalize_query  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
 
 
 class MCPRouter:
-    """Routes incoming queries to the appropriate agent using LLM-based classification."""
+    """Routes incoming queries to the appropriate agent.
+
+    Clear-cut queries are dispatched by the in-process ``IntentClassifier``;
+    everything else falls back to LLM-based classification, whose decisions
+    are fed back to the classifier.  Set ``ROUTER_FASTPATH=0`` to always
+    use the LLM.
+
+    With ``ROUTER_SPECULATIVE=1`` the router starts the most likely web
+    search (perplexity's or roadmap's) while the LLM routing call is still
+    in flight, and hands the result to the agent if the route matches.
+    """
 
-    def __init__(self, llm_client, agents: dict):
+    AGENT_DESCRIPTIONS = (
+        "- perplexity: Answers specific questions using web search. "
+        "Use for facts, definitions, current events, or general knowledge questions.\n"
+        "- roadmap: Generates a detailed learning plan for a topic. "
+        'Use for "how to learn X", "roadmap for Y", "study plan", "learning path".\n'
+        "- skillmatch: Finds users with complementary skills for skill exchange. "
+        'Use for ANY query mentioning skills like "I offer X", "I need Y", '
+        '"I can teach Z", "I want to learn W", "find users", "match me", '
+        '"skill exchange", "connect me".\n'
+        "- studygroup: Forms optimal study groups among students based on "
+        "complementary academic strengths and weaknesses using clustering algorithms. "
+        'Use for "form study groups", "create teams", "group students", '
+        '"study group", "team formation", "collaborative learning groups".'
+    )
+
+    def __init__(
+        self,
+        llm_client,
+        agents: dict,
+        classifier: IntentClassifier | None = None,
+        speculative: bool | None = None,
+    ):
         self.llm_client = llm_client
         self.agents = agents
+        self.inflight = SingleFlight("router")
+        if classifier is None and os.getenv("ROUTER_FASTPATH", "1") == "1":
+            classifier = IntentClassifier.from_descriptions(self.AGENT_DESCRIPTIONS)
+        self.classifier = classifier
+        if speculative is None:
+            speculative = os.getenv("ROUTER_SPECULATIVE", "0") == "1"
+        self.speculative = speculative
+        self.speculation_stats = {"started": 0, "used": 0, "cancelled": 0}
 
     async def route(self, query: str) -> dict:
-        print(f'MCP Router received query: "{query}"')
-
-        agent_descriptions = (
-            "- perplexity: Answers specific questions using web search. "
-            "Use for facts, definitions, current events, or general knowledge questions.\n"
-            "- roadmap: Generates a detailed learning plan for a topic. "
-            'Use for "how to learn X", "roadmap for Y", "study plan", "learning path".\n'
-            "- skillmatch: Finds users with complementary skills for skill exchange. "
-            'Use for ANY query mentioning skills like "I offer X", "I need Y", '
-            '"I can teach Z", "I want to learn W", "find users", "match me", '
-            '"skill exchange", "connect me".\n'
-            "- studygroup: Forms optimal study groups among students based on "
-            "complementary academic strengths and weaknesses using clustering algorithms. "
-            'Use for "form study groups", "create teams", "group students", '
-            '"study group", "team formation", "collaborative learning groups".'
+        """Route ``query`` to an agent and return its result.
+
+        Concurrent requests for the same (case/whitespace-normalised) query
+        share a single routing + agent run.
+        """
+        return await self.inflight.do(
+            normalize_query(query), lambda: self._route(query)
         )
 
+    async def _route(self, query: str, decision: tuple[str, str] | None = None) -> dict:
+        logger.debug("Router received query", extra={"query": query})
+
+        scores: dict[str, float] = {}
+        if decision is None:
+            decision, scores = self._fast_decision(query)
+        speculation = self._speculate(query, scores) if decision is None else None
+        agent_name = "router"
+        try:
+            agent_name, agent_input = decision or await self._timed_decision(query)
+            result = await self._run_agent(agent_name, agent_input, speculation)
+            return {"agentUsed": agent_name, "result": result}
+
+        except Exception as exc:
+            logger.warning(
+                "Routing failed, falling back to perplexity",
+                extra={"failed_agent": agent_name, "error": str(exc)},
+            )
+            ROUTER_FALLBACKS.inc(agent=agent_name, error=type(exc).__name__)
+            fallback = await self._run_agent("perplexity", query, speculation)
+            return {"agentUsed": "perplexity (fallback)", "result": fallback}
+
+        finally:
+            if speculation is not None:
+                self._discard(speculation)
+
+    async def route_batch(
+        self, queries: list[str], concurrency: int | None = None
+    ) -> list[dict]:
+        """Route many queries; results come back in input order.
+
+        See :meth:`route_batch_iter` for the item format.
+        """
+        items = [item async for item in self.route_batch_iter(queries, concurrency)]
+        return sorted(items, key=lambda item: item["index"])
+
+    async def route_batch_iter(
+        self, queries: list[str], concurrency: int | None = None
+    ) -> AsyncIterator[dict]:
+        """Route many queries, yielding each result as soon as it completes.
+
+        Queries the fast-path classifier cannot decide are classified
+        together in batched LLM calls of up to ``ROUTER_BATCH_SIZE``
+        queries.  At most ``concurrency`` agents run at once
+        (``BATCH_CONCURRENCY``, default 4), and their LLM calls are
+        scheduled in the low-priority ``batch`` lane.  Each item is
+        ``{"index", "query", "agentUsed", "result"}`` or, if that query
+        failed, ``{"index", "query", "error"}`` — one failure never fails
+        the batch.
+        """
+        if concurrency is None:
+            concurrency = int(os.getenv("BATCH_CONCURRENCY", "4"))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        with priority_scope("batch"):
+            decisions = await self._decide_batch(queries)
+
+        async def run_one(index: int, query: str, decision) -> dict:
+            async with semaphore:
+                try:
+                    if not query or not query.strip():
+                        raise ValueError('A "query" is required.')
+                    routed = await self._route(query, decision)
+                    return {"index": index, "query": query, **routed}
+                except Exception as exc:
+                    logger.warning("Batch item failed", extra={"index": index, "error": str(exc)})
+                    return {"index": index, "query": query, "error": str(exc)}
+
+        with priority_scope("batch"):
+            tasks = [
+                asyncio.ensure_future(run_one(i, q, d))
+                for i, (q, d) in enumerate(zip(queries, decisions))
+            ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def route_stream(self, query: str) -> AsyncIterator[dict]:
+        """Streaming variant of :meth:`route`.
+
+        Yields ``{"event": ..., "data": ...}`` dicts: a ``route`` event with
+        the chosen agent first, then whatever the agent streams (``sources``,
+        ``token``), or a single ``result`` event for agents that cannot
+        stream.  Errors after the route has been announced are reported as
+        an ``error`` event rather than a fallback.
+        """
+        logger.debug("Router received streaming query", extra={"query": query})
+
+        decision, scores = self._fast_decision(query)
+        speculation = self._speculate(query, scores) if decision is None else None
+        try:
+            try:
+                agent_name, agent_input = decision or await self._timed_decision(query)
+                label = agent_name
+            except Exception as exc:
+                logger.warning(
+                    "Routing failed, falling back to perplexity",
+                    extra={"failed_agent": "router", "error": str(exc)},
+                )
+                ROUTER_FALLBACKS.inc(agent="router", error=type(exc).__name__)
+                agent_name, agent_input = "perplexity", query
+                label = "perplexity (fallback)"
+
+            yield {"event": "route", "data": {"agentUsed": label, "input": agent_input}}
+
+            agent = self.agents[agent_name]
+            prefetched = self._take(speculation, agent_name, agent_input)
+            kwargs = {"prefetched": prefetched} if prefetched is not None else {}
+            try:
+                with agent_scope(agent_name), span("agent"):
+                    if hasattr(agent, "run_stream"):
+                        async for event in agent.run_stream(agent_input, **kwargs):
+                            yield event
+                    else:
+                        yield {"event": "result", "data": await agent.run(agent_input, **kwargs)}
+            except Exception as exc:
+                logger.warning("Streaming agent failed", extra={"failed_agent": agent_name, "error": str(exc)})
+                yield {"event": "error", "data": {"message": str(exc)}}
+                return
+
+            yield {"event": "done", "data": {"agentUsed": label}}
+
+        finally:
+            if speculation is not None:
+                self._discard(speculation)
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    def _fast_decision(self, query: str) -> tuple[tuple[str, str] | None, dict[str, float]]:
+        """Classify locally; returns ``((agent, input) or None, scores)``."""
+        if self.classifier is None:
+            return None, {}
+        with span("route_fast", "router") as timing:
+            agent_name, confidence, scores = self.classifier.classify(query)
+            if agent_name in self.agents:
+                timing.agent = agent_name
+        if agent_name in self.agents:
+            logger.info(
+                "Fast-path routing decision", extra={"route": agent_name, "confidence": confidence}
+            )
+            return (agent_name, self.classifier.agent_input(agent_name, query)), scores
+        return None, scores
+
+    async def _timed_decision(self, query: str) -> tuple[str, str]:
+        """:meth:`_decide_with_llm` inside a ``route_llm`` span."""
+        with agent_scope("router"), span("route_llm") as timing:
+            decision = await self._decide_with_llm(query)
+            timing.agent = decision[0]
+            return decision
+
+    async def _decide_with_llm(self, query: str) -> tuple[str, str]:
+        """Ask the LLM which agent should handle ``query``.
+
+        The decision is fed back to the fast-path classifier.
+        """
         prompt = (
             "You are an intelligent router. Select the best agent for the user's query.\n\n"
-            f"Available agents:\n{agent_descriptions}\n\n"
+            f"Available agents:\n{self.AGENT_DESCRIPTIONS}\n\n"
             f'User query: "{query}"\n\n'
             'Respond with a JSON object containing "agent" (the agent\'s name) '
             'and "input" (the query for that agent).'
@@ -37,22 +236,146 @@ class MCPRouter:
 
         response_str = await self.llm_client.generate_text(prompt, 0.1)
 
-        try:
-            json_match = re.search(r"\{[\s\S]*\}", response_str)
-            if not json_match:
-                raise ValueError("LLM did not return valid JSON for routing.")
-            decision = json.loads(json_match.group(0))
-            print(f"AI routing decision: {decision}")
-
-            agent_name = decision.get("agent", "")
-            agent_to_run = self.agents.get(agent_name)
-            if agent_to_run is None:
-                raise ValueError(f"AI chose an invalid agent: {agent_name}")
-
-            result = await agent_to_run.run(decision.get("input", query))
-            return {"agentUsed": agent_name, "result": result}
+        json_match = re.search(r"\{[\s\S]*\}", response_str)
+        if not json_match:
+            raise ValueError("LLM did not return valid JSON for routing.")
+        decision = json.loads(json_match.group(0))
+        logger.info("LLM routing decision", extra={"route": decision.get("agent")})
 
-        except Exception as exc:
-            print(f"MCP Routing failed: {exc}  — Falling back to perplexity agent.")
-            fallback = await self.agents["perplexity"].run(query)
-            return {"agentUsed": "perplexity (fallback)", "result": fallback}
+        agent_name = decision.get("agent", "")
+        if agent_name not in self.agents:
+            raise ValueError(f"AI chose an invalid agent: {agent_name}")
+
+        if self.classifier is not None:
+            self.classifier.observe(query, agent_name)
+        return agent_name, decision.get("input", query)
+
+    async def _decide_batch(self, queries: list[str]) -> list[tuple[str, str] | None]:
+        """Decide routes for many queries with as few LLM calls as possible.
+
+        Returns one entry per query; ``None`` means undecided, in which case
+        the per-query path (classifier, single LLM call, fallback) applies.
+        """
+        decisions: list[tuple[str, str] | None] = []
+        pending: list[int] = []
+        for i, query in enumerate(queries):
+            decision = self._fast_decision(query)[0] if query and query.strip() else None
+            decisions.append(decision)
+            if decision is None and query and query.strip():
+                pending.append(i)
+
+        batch_size = max(1, int(os.getenv("ROUTER_BATCH_SIZE", "20")))
+        chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        results = await asyncio.gather(
+            *(self._decide_chunk_with_llm([queries[i] for i in chunk]) for chunk in chunks),
+            return_exceptions=True,
+        )
+        for chunk, chunk_result in zip(chunks, results):
+            if isinstance(chunk_result, BaseException):
+                logger.warning(
+                    "Batched routing failed, routing individually", extra={"error": str(chunk_result)}
+                )
+                continue
+            for offset, decision in enumerate(chunk_result):
+                decisions[chunk[offset]] = decision
+        return decisions
+
+    async def _decide_chunk_with_llm(self, queries: list[str]) -> list[tuple[str, str] | None]:
+        """Classify several queries in one LLM call."""
+        numbered = "\n".join(f"{i}. {json.dumps(q)}" for i, q in enumerate(queries))
+        prompt = (
+            "You are an intelligent router. Select the best agent for each user query.\n\n"
+            f"Available agents:\n{self.AGENT_DESCRIPTIONS}\n\n"
+            f"User queries:\n{numbered}\n\n"
+            'Respond with a JSON array containing one object per query, each with '
+            '"index" (the query number), "agent" (the agent\'s name) and '
+            '"input" (the query for that agent).'
+        )
+
+        with agent_scope("router"), span("route_llm"):
+            response_str = await self.llm_client.generate_text(prompt, 0.1)
+
+        json_match = re.search(r"\[[\s\S]*\]", response_str)
+        if not json_match:
+            raise ValueError("LLM did not return a JSON array for batched routing.")
+        entries = json.loads(json_match.group(0))
+
+        decisions: list[tuple[str, str] | None] = [None] * len(queries)
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index, agent_name = entry.get("index"), entry.get("agent", "")
+            if not isinstance(index, int) or not 0 <= index < len(queries):
+                continue
+            if agent_name not in self.agents:
+                continue
+            decisions[index] = (agent_name, entry.get("input", queries[index]))
+            if self.classifier is not None:
+                self.classifier.observe(queries[index], agent_name)
+        return decisions
+
+    # ── speculative search ────────────────────────────────────────────────
+
+    def _speculate(self, query: str, scores: dict[str, float]) -> dict | None:
+        """Start the likely agent's web search while routing is undecided.
+
+        Only agents exposing ``search_query`` can be speculated on.  The
+        classifier's leaning picks between them; perplexity wins ties since
+        it is also the fallback.
+        """
+        if not self.speculative:
+            return None
+        candidates = [
+            name for name in ("perplexity", "roadmap")
+            if hasattr(self.agents.get(name), "search_query")
+        ]
+        if not candidates:
+            return None
+        agent_name = max(candidates, key=lambda n: (scores.get(n, 0.0), n == "perplexity"))
+        agent = self.agents[agent_name]
+        # search for the input the router is expected to hand over (the bare
+        # topic for roadmaps), so the speculation matches it in ``_take``
+        search = agent.search_query(IntentClassifier.agent_input(agent_name, query))
+        task = asyncio.ensure_future(agent.websearch_tool(search))
+        self.speculation_stats["started"] += 1
+        return {"agent": agent_name, "search": search, "task": task, "taken": False, "discarded": False}
+
+    def _take(self, speculation: dict | None, agent_name: str, agent_input):
+        """Hand the speculative search to ``agent_name`` if it is the search it would run.
+
+        A search for another agent is kept for a possible perplexity
+        fallback.  When the router rewrote this agent's input (e.g. a
+        roadmap topic) the speculated search is for the wrong query and is
+        cancelled right away.
+        """
+        if (
+            speculation is None or speculation["taken"] or speculation["discarded"]
+            or speculation["agent"] != agent_name
+        ):
+            return None
+        wanted = self.agents[agent_name].search_query(agent_input)
+        if normalize_query(wanted) != normalize_query(speculation["search"]):
+            self._discard(speculation)
+            return None
+        speculation["taken"] = True
+        self.speculation_stats["used"] += 1
+        return speculation["task"]
+
+    def _discard(self, speculation: dict) -> None:
+        """Cancel a speculative search nobody picked up."""
+        task = speculation["task"]
+        if speculation["taken"] or speculation["discarded"]:
+            return
+        speculation["discarded"] = True
+        if not task.done():
+            task.cancel()
+            self.speculation_stats["cancelled"] += 1
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _run_agent(self, agent_name: str, agent_input, speculation: dict | None):
+        agent = self.agents[agent_name]
+        prefetched = self._take(speculation, agent_name, agent_input)
+        with agent_scope(agent_name), span("agent"):
+            if prefetched is not None:
+                return await agent.run(agent_input, prefetched=prefetched)
+            return await agent.run(agent_input)
@@ -0,0 +1,79 @@
+"""
+Single-Flight Request Coalescing
+================================
+Concurrent callers asking for the same key share one in-flight coroutine
+instead of each doing the work.  Used by the router (identical queries),
+the LLM client (identical completions) and the tool registry (identical
+tool calls).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a user query, for use as a key."""
+    return " ".join(query.lower().split())
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key.
+
+    The first caller for a key (the *leader*) starts the work as a task;
+    callers arriving while it is still running await the same task and get
+    the same result or exception.  The key is forgotten as soon as the task
+    finishes, so this never serves stale results — it only merges overlap.
+
+    The shared task is shielded: a cancelled caller does not cancel the work
+    for the other callers still waiting on it.  Once *every* waiter has been
+    cancelled the shared task is cancelled too, so abandoned work (e.g. an
+    unused speculative search) does not keep running upstream.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[task] = 0
+            self.executed += 1
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+                if self._waiters[task] == 0 and not task.done():
+                    task.cancel()
+            raise
+
+    def running(self, key: Hashable) -> bool:
+        """Whether a call for ``key`` is in flight (so ``do`` would join it)."""
+        return key in self._inflight
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._waiters.pop(task, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -1,18 +1,85 @@
-from tools.websearch import web_search
+from functools import partial
+
+from mcp_server.circuit_breaker import UpstreamHealth  # type: ignore[import-not-found]
+from mcp_server.http_pool import UpstreamPool  # type: ignore[import-not-found]
+from mcp_server.metrics import span  # type: ignore[import-not-found]
+from mcp_server.singleflight import SingleFlight  # type: ignore[import-not-found]
+from tools.websearch import web_search, search_reachable, TAVILY_BASE_URL, TAVILY_SEARCH_URL
+from tools.search_cache import SearchCache  # type: ignore[import-not-found]
+from tools.db_tool import (  # type: ignore[import-not-found]
+    BACKEND_API_URL,
+    backend_reachable,
+    find_complementary_users,
+    test_connection,
+)
 
 
 class ToolRegistry:
-    """Simple registry that maps tool names to callable functions."""
+    """Simple registry that maps tool names to callable functions.
+
+    When an ``UpstreamPool`` is supplied, HTTP-backed tools are bound to the
+    pooled client for their upstream host so every call reuses connections.
+    Tools registered with ``coalesce=True`` share one in-flight call between
+    concurrent callers passing identical arguments.  ``web_search`` is also
+    fronted by a ``SearchCache``.  Every call is timed as a ``tool:<name>``
+    span.  With an ``UpstreamHealth``, the Tavily and backend tools share
+    that upstream's circuit breaker.
+    """
 
-    def __init__(self):
+    def __init__(self, http: UpstreamPool | None = None, health: UpstreamHealth | None = None):
+        self.http = http
         self.tools: dict = {}
+        self.inflight = SingleFlight("tools")
+        self.search_breaker = health.breaker(
+            "tavily", probe=self._bind(search_reachable, TAVILY_BASE_URL)
+        ) if health else None
+        self.backend_breaker = health.breaker(
+            "backend", probe=self._bind(backend_reachable, BACKEND_API_URL)
+        ) if health else None
+        self.search_cache = SearchCache.from_env(
+            self._bind(web_search, TAVILY_SEARCH_URL, self.search_breaker)
+        )
         self._register_default_tools()
 
     def _register_default_tools(self):
-        self.register("web_search", web_search)
+        self.register("web_search", self.search_cache, coalesce=True)
+        self.register(
+            "find_complementary_users",
+            self._bind(find_complementary_users, BACKEND_API_URL, self.backend_breaker),
+        )
+        self.register("test_connection", self._bind(test_connection, BACKEND_API_URL))
+
+    def _bind(self, func, url: str, breaker=None):
+        bound = {}
+        if self.http is not None:
+            bound["client"] = self.http.client(url)
+        if breaker is not None:
+            bound["breaker"] = breaker
+        return partial(func, **bound) if bound else func
+
+    def register(self, name: str, func, coalesce: bool = False):
+        self.tools[name] = self._timed(name, self._coalesced(name, func) if coalesce else func)
+
+    @staticmethod
+    def _timed(name: str, func):
+        async def call(*args, **kwargs):
+            with span(f"tool:{name}"):
+                return await func(*args, **kwargs)
+        return call
+
+    def _coalesced(self, name: str, func):
+        async def call(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return await func(*args, **kwargs)
+            return await self.inflight.do(key, lambda: func(*args, **kwargs))
+        return call
 
-    def register(self, name: str, func):
-        self.tools[name] = func
+    async def aclose(self):
+        """Stop background work owned by tools (cache refreshes, open files)."""
+        await self.search_cache.aclose()
 
     def get(self, name: str):
         if name not in self.tools:
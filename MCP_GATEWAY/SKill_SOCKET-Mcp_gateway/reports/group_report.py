@@ -3,11 +3,18 @@ Group Report Generator
 ======================
 Utility module for generating standalone Markdown reports from
 study-group formation results.
+
+:func:`iter_report` yields the report one group at a time, so it can be
+streamed or written to disk without building the whole document in memory;
+:func:`generate_report` joins it into a single string.
 """
 
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Iterator
+
+import numpy as np  # type: ignore[import-untyped]
 
 
 def generate_report(
@@ -29,7 +36,35 @@ def generate_report(
     -------
     A Markdown-formatted string.
     """
-    from tools.clustering_tool import compute_group_stats  # type: ignore[import-not-found]
+    return "\n".join(
+        line for section in _report_sections(groups, subjects, method, target_size) for line in section
+    )
+
+
+def iter_report(
+    groups: list[list[dict]],
+    subjects: list[str],
+    method: str = "kmeans",
+    target_size: int = 4,
+) -> Iterator[str]:
+    """Yield the :func:`generate_report` Markdown in chunks — the header, one
+    chunk per group, then the overall analysis — each ending in a newline.
+    """
+    for section in _report_sections(groups, subjects, method, target_size):
+        yield "\n".join(section) + "\n"
+
+
+def _report_sections(
+    groups: list[list[dict]],
+    subjects: list[str],
+    method: str,
+    target_size: int,
+) -> Iterator[list[str]]:
+    from tools.clustering_tool import (  # type: ignore[import-not-found]
+        compute_partition_stats,
+        partition_group_stats,
+        skill_matrix,
+    )
 
     total_students = sum(len(g) for g in groups)
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -46,13 +81,22 @@ def generate_report(
     lines.append(f"| Subjects | {', '.join(subjects)} |")
     lines.append("")
     lines.append("---\n")
+    yield lines
+
+    # One matrix and one grouped pass for the whole partition
+    members = [s for group in groups for s in group]
+    matrix = skill_matrix(members, subjects)
+    matrix[np.isnan(matrix)] = 5.0
+    labels = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+    partition = compute_partition_stats(matrix, labels, len(groups))
+    del members, matrix, labels
 
-    diversity_scores: list[float] = []
+    diversity_scores = [round(float(d), 2) for d in partition["diversity"]]
 
     for i, group in enumerate(groups, 1):
-        stats = compute_group_stats(group, subjects)
-        diversity_scores.append(stats["diversity_score"])
+        stats = partition_group_stats(partition, i - 1, subjects)
 
+        lines = []
         lines.append(f"## Group {i}  ({len(group)} members)")
         lines.append(f"**Diversity Score:** {stats['diversity_score']}/10\n")
 
@@ -84,8 +128,10 @@ def generate_report(
                 f"(min {v['min']:.0f} → max {v['max']:.0f})"
             )
         lines.append("")
+        yield lines
 
     # ── Overall analysis ──────────────────────────────────────────────
+    lines = []
     avg_diversity = sum(diversity_scores) / len(diversity_scores) if diversity_scores else 0
     lines.append("---\n")
     lines.append(f"## 🏆 Overall Analysis\n")
@@ -107,5 +153,4 @@ def generate_report(
     else:
         lines.append("⚠️ **Fair** — Some groups lack diversity. "
                       "Try a smaller target group size or a different algorithm.")
-
-    return "\n".join(lines)
+    yield lines
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Pre-warm Roadmap Store
+======================
+Generates roadmaps for a list of popular topics and writes them to the
+roadmap store (``ROADMAP_STORE_DB``) so the gateway can serve them instantly.
+
+Usage:
+    ROADMAP_STORE_DB=roadmaps.sqlite3 python scripts/prewarm_roadmaps.py Python Flutter "Machine Learning"
+    ROADMAP_STORE_DB=roadmaps.sqlite3 python scripts/prewarm_roadmaps.py --file topics.txt --force
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Ensure project root is on the path so relative imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dotenv import load_dotenv  # noqa: E402  # type: ignore[import-untyped]
+
+load_dotenv()
+
+from mcp_server.http_pool import UpstreamPool              # noqa: E402  # type: ignore[import-not-found]
+from mcp_server.cerebras_client import CerebrasClient      # noqa: E402  # type: ignore[import-not-found]
+from mcp_server.tool_registry import ToolRegistry          # noqa: E402  # type: ignore[import-not-found]
+from agents.roadmap_agent import RoadmapAgent              # noqa: E402  # type: ignore[import-not-found]
+from tools.roadmap_store import RoadmapStore               # noqa: E402  # type: ignore[import-not-found]
+
+
+async def main(topics: list[str], force: bool, concurrency: int) -> int:
+    store = RoadmapStore.from_env()
+    if store is None:
+        print("❌ ROADMAP_STORE_DB is not set — nothing to pre-warm into.")
+        return 1
+
+    http = UpstreamPool()
+    tools = ToolRegistry(http)
+    agent = RoadmapAgent(CerebrasClient(http), tools, store=store)
+    try:
+        results = await agent.prewarm(topics, concurrency=concurrency, force=force)
+    finally:
+        await agent.aclose()
+        await tools.aclose()
+        await http.aclose()
+
+    for topic, outcome in results.items():
+        print(f"  {topic}: {outcome}")
+    failed = sum(1 for outcome in results.values() if outcome.startswith("error"))
+    print(f"\n✅ {len(results) - failed}/{len(results)} topics ready in {os.environ['ROADMAP_STORE_DB']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the roadmap store")
+    parser.add_argument("topics", nargs="*", help="Topics to generate roadmaps for")
+    parser.add_argument("--file", help="Read additional topics from a file (one per line)")
+    parser.add_argument("--force", action="store_true", help="Regenerate even fresh entries")
+    parser.add_argument("--concurrency", type=int, default=2, help="Parallel generations (default: 2)")
+    args = parser.parse_args()
+
+    topics = list(args.topics)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            topics.extend(line.strip() for line in f if line.strip())
+    if not topics:
+        parser.error("no topics given")
+    sys.exit(asyncio.run(main(topics, args.force, args.concurrency)))
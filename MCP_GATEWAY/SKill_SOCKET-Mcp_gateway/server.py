@@ -4,44 +4,74 @@ Skill Socket MCP Gateway — Python Edition
 FastAPI server that routes incoming queries to the appropriate agent.
 """
 
+import json
+import logging
 import os
 import sys
+import tempfile
 import time
+import uuid
 from contextlib import asynccontextmanager
+from typing import Literal
 
 # Ensure the project root is on sys.path for local imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from dotenv import load_dotenv  # type: ignore[import-untyped]
-from fastapi import FastAPI, HTTPException  # type: ignore[import-untyped]
+from fastapi import FastAPI, Header, HTTPException, Query, Request  # type: ignore[import-untyped]
+from fastapi.concurrency import run_in_threadpool  # type: ignore[import-untyped]
 from fastapi.middleware.cors import CORSMiddleware  # type: ignore[import-untyped]
-from pydantic import BaseModel  # type: ignore[import-untyped]
+from fastapi.responses import PlainTextResponse, StreamingResponse  # type: ignore[import-untyped]
+from pydantic import BaseModel, Field, model_validator  # type: ignore[import-untyped]
 
 load_dotenv()
 
+from mcp_server.log_setup import configure_logging, logging_stats, request_id, shutdown_logging  # type: ignore[import-not-found]
+
+configure_logging()
+
+from mcp_server.http_pool import UpstreamPool  # type: ignore[import-not-found]
+from mcp_server.cache import TTLCache, completion_cache_from_env  # type: ignore[import-not-found]
+from mcp_server.circuit_breaker import UpstreamHealth  # type: ignore[import-not-found]
+from mcp_server.compute_pool import ComputePool  # type: ignore[import-not-found]
+from mcp_server.metrics import (  # type: ignore[import-not-found]
+    HTTP_SECONDS,
+    REGISTRY,
+    format_traceparent,
+    start_trace,
+    trace_context,
+)
 from mcp_server.cerebras_client import CerebrasClient  # type: ignore[import-not-found]
 from mcp_server.tool_registry import ToolRegistry  # type: ignore[import-not-found]
 from mcp_server.router import MCPRouter  # type: ignore[import-not-found]
+from mcp_server.rate_limiter import UpstreamBusyError  # type: ignore[import-not-found]
 from agents.perplexity_agent import PerplexityAgent  # type: ignore[import-not-found]
 from agents.roadmap_agent import RoadmapAgent  # type: ignore[import-not-found]
 from agents.skill_match_agent import SkillMatchAgent  # type: ignore[import-not-found]
-from agents.study_group_agent import StudyGroupAgent  # type: ignore[import-not-found]
+from agents.study_group_agent import DEFAULT_SUBJECTS, StudyGroupAgent, iter_study_group_report  # type: ignore[import-not-found]
+from tools.cohort_io import FORMATS  # type: ignore[import-not-found]
+from tools.roadmap_store import RoadmapStore  # type: ignore[import-not-found]
+from tools.group_set import StudyGroupSet  # type: ignore[import-not-found]
 
 
 # ── application setup ────────────────────────────────────────────────────────
 _start_time = time.time()
+logger = logging.getLogger("gateway")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialise shared singletons once at startup."""
-    llm = CerebrasClient()
-    tools = ToolRegistry()
+    http = UpstreamPool()
+    health = UpstreamHealth()
+    llm = CerebrasClient(http, cache=completion_cache_from_env(), health=health)
+    tools = ToolRegistry(http, health=health)
+    compute = ComputePool.from_env()
 
     perplexity = PerplexityAgent(llm, tools)
-    roadmap = RoadmapAgent(llm, tools)
+    roadmap = RoadmapAgent(llm, tools, store=RoadmapStore.from_env())
     skillmatch = SkillMatchAgent(llm, tools)
-    studygroup = StudyGroupAgent(llm, tools)
+    studygroup = StudyGroupAgent(llm, tools, compute=compute)
 
     router = MCPRouter(llm, {
         "perplexity": perplexity,
@@ -50,9 +80,28 @@ async def lifespan(app: FastAPI):
         "studygroup": studygroup,
     })
 
+    app.state.http = http
+    app.state.health = health
+    app.state.llm = llm
+    app.state.tools = tools
+    app.state.roadmap = roadmap
+    app.state.studygroup = studygroup
+    app.state.group_sets = TTLCache(
+        max_size=int(os.getenv("STUDYGROUP_SETS_MAX", "64")),
+        ttl=float(os.getenv("STUDYGROUP_SETS_TTL", "86400")),
+    )
+    app.state.compute = compute
     app.state.router = router
-    print("🚀 Skill Socket MCP Gateway (Python) is ready")
-    yield
+    logger.info("Skill Socket MCP Gateway (Python) is ready")
+    try:
+        yield
+    finally:
+        await roadmap.aclose()
+        await tools.aclose()
+        await health.aclose()
+        await http.aclose()
+        compute.shutdown()
+        shutdown_logging()
 
 
 app = FastAPI(
@@ -68,6 +117,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+TRACE_PROPAGATION = os.getenv("TRACE_PROPAGATION", "0") == "1"
+
+
+class ObserveRequests:
+    """Time and tag every request; with ``TRACE_PROPAGATION=1`` also continue its trace.
+
+    Plain ASGI middleware, so streamed responses (SSE, NDJSON) are timed
+    until their last body chunk has been sent, not just their headers.
+    The request id (the caller's ``X-Request-ID`` or a new one) is attached
+    to every log record written while handling the request and echoed back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        rid = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        trace = start_trace(traceparent) if TRACE_PROPAGATION else None
+        extra_headers = [(b"x-request-id", rid.encode("latin-1"))]
+        if trace is not None:
+            extra_headers.append((b"traceparent", format_traceparent(*trace).encode("latin-1")))
+
+        started = time.perf_counter()
+        status = 500
+        observed = False
+
+        def observe() -> None:
+            nonlocal observed
+            observed = True
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=status
+            )
+
+        async def send_observed(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), *extra_headers]}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        rid_token = request_id.set(rid)
+        token = trace_context.set(trace)
+        try:
+            await self.app(scope, receive, send_observed)
+        finally:
+            trace_context.reset(token)
+            request_id.reset(rid_token)
+            if not observed:
+                observe()
+
+
+app.add_middleware(ObserveRequests)
+
 
 # ── request / response models ────────────────────────────────────────────────
 
@@ -75,6 +186,89 @@ class InvokeRequest(BaseModel):
     query: str
 
 
+class BatchInvokeRequest(BaseModel):
+    queries: list[str]
+    concurrency: int | None = None
+    stream: bool = False
+
+
+class PrewarmRequest(BaseModel):
+    topics: list[str]
+    force: bool = False
+    concurrency: int = 2
+
+
+ClusterMethod = Literal["kmeans", "agglomerative", "minibatch", "auto"]
+Assignment = Literal["greedy", "local_search"]
+
+
+class StudentProfile(BaseModel):
+    name: str = Field(min_length=1)
+    skills: dict[str, float] = Field(default_factory=dict)
+
+
+class SkillUpdate(BaseModel):
+    skills: dict[str, float]
+
+
+class StudyGroupRequest(BaseModel):
+    """A cohort, either as ``students`` or column-wise as ``names`` + ``scores``."""
+
+    students: list[StudentProfile] | None = None
+    names: list[str] | None = None
+    scores: list[list[float | None]] | None = None
+    subjects: list[str] | None = Field(default=None, min_length=1)
+    target_size: int = Field(default=4, ge=2, le=50)
+    method: ClusterMethod = "kmeans"
+    assignment: Assignment = "greedy"
+    report: bool = False
+
+    @model_validator(mode="after")
+    def _check_cohort(self) -> "StudyGroupRequest":
+        if (self.students is None) == (self.scores is None):
+            raise ValueError('Give the cohort as either "students" or "scores".')
+        if self.students is not None:
+            names = [s.name for s in self.students]
+            known = set(self.subjects or DEFAULT_SUBJECTS)
+            for student in self.students:
+                unknown = set(student.skills) - known
+                if unknown:
+                    raise ValueError(f"{student.name!r} has scores for unknown subjects {sorted(unknown)}.")
+        else:
+            widths = {len(row) for row in self.scores}
+            if len(widths) > 1:
+                raise ValueError('Every row of "scores" needs the same number of subjects.')
+            if self.subjects and widths and widths != {len(self.subjects)}:
+                raise ValueError(f'"scores" rows need one value per subject ({len(self.subjects)}).')
+            names = self.names if self.names is not None else []
+            if self.names is not None and len(self.names) != len(self.scores):
+                raise ValueError('"names" and "scores" need the same length.')
+        if not (self.students or self.scores):
+            raise ValueError("The cohort has no students.")
+        if len(set(names)) != len(names):
+            raise ValueError("Student names must be unique.")
+        return self
+
+    def payload(self) -> dict:
+        """The study-group agent's dict input."""
+        return self.model_dump(exclude_none=True, exclude={"report"})
+
+
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "100"))
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "16"))
+UPLOAD_DIR = os.getenv("STUDYGROUP_UPLOAD_DIR") or None
+UPLOAD_MAX_BYTES = int(float(os.getenv("STUDYGROUP_UPLOAD_MAX_MB", "200")) * 1024 * 1024)
+
+# Content-Type → cohort format, for uploads without ?format=
+UPLOAD_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/vnd.apache.arrow.file": "feather",
+    "application/x-npy": "npy",
+    "application/x-npz": "npz",
+}
+
+
 # ── endpoints ────────────────────────────────────────────────────────────────
 
 @app.get("/health")
@@ -84,9 +278,40 @@ async def health_check():
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         "uptime": round(float(time.time() - _start_time), 2),
         "service": "Skill Socket MCP Gateway (Python)",
+        "upstreams": app.state.health.summary(),
     }
 
 
+@app.get("/mcp/stats")
+async def mcp_stats():
+    return {
+        "upstream": app.state.http.stats(),
+        "circuit_breakers": app.state.health.stats(),
+        "llm_cache": app.state.llm.cache.stats(),
+        "llm_scheduler": app.state.llm.scheduler.stats(),
+        "search_cache": app.state.tools.search_cache.stats(),
+        "roadmap_store": app.state.roadmap.stats(),
+        "compute": app.state.compute.stats(),
+        "group_sets": app.state.group_sets.stats(),
+        "fast_path_routing": (
+            app.state.router.classifier.stats() if app.state.router.classifier else None
+        ),
+        "speculation": app.state.router.speculation_stats,
+        "coalescing": {
+            "router": app.state.router.inflight.stats(),
+            "llm": app.state.llm.inflight.stats(),
+            "tools": app.state.tools.inflight.stats(),
+        },
+        "logging": logging_stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Stage, request and upstream metrics in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.post("/mcp/invoke")
 async def mcp_invoke(body: InvokeRequest):
     if not body.query:
@@ -94,10 +319,275 @@ async def mcp_invoke(body: InvokeRequest):
     try:
         result = await app.state.router.route(body.query)
         return result
+    except UpstreamBusyError as exc:
+        retry_after = int(exc.retry_after or 1)
+        raise HTTPException(
+            status_code=503, detail=str(exc), headers={"Retry-After": str(retry_after)}
+        )
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+@app.post("/mcp/invoke/batch")
+async def mcp_invoke_batch(body: BatchInvokeRequest):
+    """Run several queries through the router with bounded concurrency.
+
+    Returns ``{"results": [...]}`` in input order, or — with ``"stream": true``
+    — newline-delimited JSON items in completion order.  Each item carries
+    its ``index`` and either ``agentUsed``/``result`` or ``error``.
+    """
+    if not body.queries:
+        raise HTTPException(status_code=400, detail='A non-empty "queries" list is required.')
+    if len(body.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_QUERIES} queries are allowed per batch.",
+        )
+    concurrency = body.concurrency
+    if concurrency is not None:
+        concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+
+    router = app.state.router
+    if body.stream:
+        async def lines():
+            async for item in router.route_batch_iter(body.queries, concurrency):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = await router.route_batch(body.queries, concurrency)
+    return {
+        "results": results,
+        "count": len(results),
+        "errors": sum(1 for item in results if "error" in item),
+    }
+
+
+@app.post("/mcp/invoke/stream")
+async def mcp_invoke_stream(body: InvokeRequest):
+    """Server-Sent Events variant of ``/mcp/invoke``.
+
+    Emits ``route`` first, then ``sources``/``token`` (or a single ``result``)
+    events, and finishes with ``done`` or ``error``.
+    """
+    if not body.query:
+        raise HTTPException(status_code=400, detail='A "query" is required.')
+
+    async def event_source():
+        async for event in app.state.router.route_stream(body.query):
+            payload = json.dumps(event["data"], ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/studygroups")
+async def study_groups(body: StudyGroupRequest):
+    """Form study groups for a validated cohort — no LLM routing involved.
+
+    Returns the structured ``groups`` summary; set ``report`` to also get
+    the Markdown report.
+    """
+    try:
+        return await app.state.studygroup.run(body.payload(), report=body.report)
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid study-group payload: {exc}")
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+
+@app.post("/studygroups/report")
+async def study_group_report(body: StudyGroupRequest):
+    """Form study groups and stream the Markdown report one group at a time.
+
+    Accepts the ``/studygroups`` payload (``report`` is ignored).  Groups are
+    formed before the response starts; the report itself is rendered while
+    it is being sent, so memory stays flat however many groups there are.
+    """
+    try:
+        plan = await app.state.studygroup.plan(body.payload())
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid study-group payload: {exc}")
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    if plan is None:
+        raise HTTPException(status_code=400, detail='A non-empty "students" list is required.')
+
+    return StreamingResponse(
+        iter_study_group_report(plan),
+        media_type="text/markdown; charset=utf-8",
+        headers={"X-Group-Count": str(len(plan["groups"]))},
+    )
+
+
+@app.post("/studygroups/upload")
+async def study_group_upload(
+    request: Request,
+    format: str | None = None,
+    subjects: str | None = None,
+    target_size: int = Query(4, ge=2, le=50),
+    method: ClusterMethod = "kmeans",
+    assignment: Assignment = "greedy",
+    report: bool = False,
+):
+    """Form study groups for a cohort file sent as the raw request body.
+
+    The body is a CSV, Parquet, Feather/Arrow, NPY or NPZ file (see
+    :mod:`tools.cohort_io`); ``format`` defaults from the Content-Type.
+    ``subjects`` is an optional comma-separated list of subject columns.
+    The upload is streamed to a temporary file (``STUDYGROUP_UPLOAD_DIR``,
+    at most ``STUDYGROUP_UPLOAD_MAX_MB``) that the compute worker reads or
+    memory-maps directly.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = format or UPLOAD_CONTENT_TYPES.get(content_type)
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown cohort format; pass ?format= one of {', '.join(FORMATS)}.",
+        )
+
+    received = 0
+    with tempfile.NamedTemporaryFile(suffix=f".{fmt}", dir=UPLOAD_DIR, delete=False) as upload:
+        path = upload.name
+    try:
+        with open(path, "wb") as upload:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="Cohort upload is too large.")
+                await run_in_threadpool(upload.write, chunk)
+        if not received:
+            raise HTTPException(status_code=400, detail="Empty cohort upload.")
+
+        logger.info("Cohort upload received", extra={"kib": round(received / 1024), "format": fmt})
+        subject_list = [s.strip() for s in subjects.split(",") if s.strip()] if subjects else None
+        try:
+            result = await app.state.studygroup.run_file(
+                path, fmt, subject_list, target_size, method, assignment, report
+            )
+        except (KeyError, TypeError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid cohort file: {exc}")
+        except RuntimeError as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+    finally:
+        os.unlink(path)
+    return result
+
+
+def _group_set(set_id: str) -> StudyGroupSet:
+    group_set = app.state.group_sets.get(set_id)
+    if group_set is None:
+        raise HTTPException(status_code=404, detail=f"Unknown group set {set_id!r}.")
+    app.state.group_sets.set(set_id, group_set)  # refresh its TTL
+    return group_set
+
+
+def _changed_groups(group_set: StudyGroupSet, group_ids: list[int]) -> dict:
+    live = set(group_set.group_ids())
+    return {
+        "affected": [group_set.group(gid) for gid in group_ids if gid in live],
+        "dissolved": [gid for gid in group_ids if gid not in live],
+        "stats": group_set.stats(),
+    }
+
+
+@app.post("/studygroups/sets")
+async def create_group_set(body: StudyGroupRequest):
+    """Form study groups and keep them for incremental updates.
+
+    Takes the ``/studygroups`` payload; returns a ``set_id`` for the
+    ``/studygroups/sets/{set_id}/...`` endpoints.  Sets live in memory
+    (``STUDYGROUP_SETS_MAX`` sets, idle ones expire after ``STUDYGROUP_SETS_TTL``).
+    """
+    try:
+        plan = await app.state.studygroup.plan(body.payload())
+        if plan is None:
+            raise HTTPException(status_code=400, detail='A non-empty "students" list is required.')
+        group_set = StudyGroupSet(
+            plan["subjects"], plan["names"], plan["scores"], plan["groups"], plan["target_size"]
+        )
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid study-group payload: {exc}")
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+    set_id = uuid.uuid4().hex
+    app.state.group_sets.set(set_id, group_set)
+    return {"set_id": set_id, "stats": group_set.stats(), "groups": group_set.groups()}
+
+
+@app.get("/studygroups/sets/{set_id}")
+async def get_group_set(set_id: str):
+    group_set = _group_set(set_id)
+    return {"set_id": set_id, "stats": group_set.stats(), "groups": group_set.groups()}
+
+
+@app.delete("/studygroups/sets/{set_id}")
+async def delete_group_set(set_id: str):
+    if app.state.group_sets.pop(set_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown group set {set_id!r}.")
+    return {"deleted": set_id}
+
+
+@app.post("/studygroups/sets/{set_id}/students")
+async def add_group_set_student(set_id: str, body: StudentProfile):
+    """Add ``{"name", "skills"}`` to the set; only the affected groups change."""
+    group_set = _group_set(set_id)
+    try:
+        changed = group_set.add_student(body.name, body.skills)
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return _changed_groups(group_set, changed)
+
+
+@app.patch("/studygroups/sets/{set_id}/students/{name}")
+async def update_group_set_student(set_id: str, name: str, body: SkillUpdate):
+    """Merge ``{"skills": {...}}`` into a member's profile."""
+    group_set = _group_set(set_id)
+    try:
+        changed = group_set.update_skills(name, body.skills)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown student {name!r}.")
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid skills: {exc}")
+    return _changed_groups(group_set, changed)
+
+
+@app.delete("/studygroups/sets/{set_id}/students/{name}")
+async def remove_group_set_student(set_id: str, name: str):
+    group_set = _group_set(set_id)
+    try:
+        changed = group_set.remove_student(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown student {name!r}.")
+    return _changed_groups(group_set, changed)
+
+
+@app.post("/admin/roadmaps/prewarm")
+async def prewarm_roadmaps(body: PrewarmRequest, x_admin_token: str | None = Header(default=None)):
+    """Generate and store roadmaps for popular topics ahead of demand.
+
+    Requires ``ADMIN_TOKEN`` to be set and sent as the ``X-Admin-Token`` header.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or x_admin_token != admin_token:
+        raise HTTPException(status_code=403, detail="Admin token required.")
+    if not body.topics:
+        raise HTTPException(status_code=400, detail='A non-empty "topics" list is required.')
+    try:
+        results = await app.state.roadmap.prewarm(
+            body.topics, concurrency=max(1, min(body.concurrency, 8)), force=body.force
+        )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return {"results": results}
+
+
 # ── entrypoint ───────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+Cerebras streaming — retries
+============================
+A connection failure before the first token is retried; one after tokens
+have been yielded must not resend the request (the caller would receive
+the same tokens twice).
+
+Run with ``python -m pytest tests``.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import httpx  # type: ignore[import-untyped]
+import pytest  # type: ignore[import-untyped]
+
+# Ensure project root is on the path so relative imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mcp_server.cerebras_client import CerebrasClient  # noqa: E402  # type: ignore[import-not-found]
+from mcp_server.rate_limiter import LLMScheduler  # noqa: E402  # type: ignore[import-not-found]
+
+
+def _event(text: str) -> bytes:
+    return f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}\n\n".encode()
+
+
+class _Stream(httpx.AsyncByteStream):
+    """SSE body that sends ``chunks`` and then, optionally, drops the connection."""
+
+    def __init__(self, chunks: list[bytes], drop: bool):
+        self.chunks = chunks
+        self.drop = drop
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.drop:
+            raise httpx.ReadError("connection reset mid-stream")
+
+
+class _Pool:
+    """Stands in for ``UpstreamPool``: every URL gets the mock client."""
+
+    def __init__(self, handler):
+        self._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        return self._client
+
+
+def _client(monkeypatch, handler) -> CerebrasClient:
+    monkeypatch.setenv("CEREBRAS_API_KEY", "test")
+    scheduler = LLMScheduler.from_env()
+    scheduler.retry_delay = lambda attempt, response=None: 0.0
+    return CerebrasClient(_Pool(handler), scheduler=scheduler)
+
+
+async def _collect(llm: CerebrasClient) -> list[str]:
+    return [delta async for delta in llm.generate_text_stream("hi")]
+
+
+def test_drop_after_first_token_is_not_retried(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, stream=_Stream([_event("Hello ")], drop=True))
+
+    llm = _client(monkeypatch, handler)
+    received: list[str] = []
+
+    async def consume():
+        async for delta in llm.generate_text_stream("hi"):
+            received.append(delta)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+    assert received == ["Hello "]
+    assert len(calls) == 1
+
+
+def test_drop_before_first_token_is_retried(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(200, stream=_Stream([], drop=True))
+        body = [_event("Hello "), _event("world"), b"data: [DONE]\n\n"]
+        return httpx.Response(200, stream=_Stream(body, drop=False))
+
+    llm = _client(monkeypatch, handler)
+    assert asyncio.run(_collect(llm)) == ["Hello ", "world"]
+    assert len(calls) == 2
@@ -0,0 +1,71 @@
+"""
+Circuit breaker — hanging backend
+=================================
+A backend that accepts connections but never answers must be counted as
+failing, so the breaker opens and later matches fail fast.
+
+Run with ``python -m pytest tests``.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from functools import partial
+
+# Ensure project root is on the path so relative imports resolve
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from agents.skill_match_agent import SkillMatchAgent  # noqa: E402  # type: ignore[import-not-found]
+from mcp_server.circuit_breaker import OPEN, CircuitBreaker  # noqa: E402  # type: ignore[import-not-found]
+from tools import db_tool  # noqa: E402  # type: ignore[import-not-found]
+
+
+class _FakeLLM:
+    async def generate_text(self, prompt, temperature=0.5, **kwargs):
+        return '{"skillsRequired": ["Python"], "skillsOffered": ["React"]}'
+
+
+class _Tools:
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    def get(self, name):
+        return partial(db_tool.find_complementary_users, breaker=self.breaker)
+
+
+async def _hanging_backend() -> tuple[asyncio.AbstractServer, str]:
+    """A server that reads requests and never responds."""
+
+    async def hang(reader, writer):
+        await reader.read(65536)
+        await asyncio.sleep(3600)
+
+    server = await asyncio.start_server(hang, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def test_hanging_backend_opens_breaker(monkeypatch):
+    async def scenario():
+        server, url = await _hanging_backend()
+        monkeypatch.setattr(db_tool, "BACKEND_API_URL", url)
+        monkeypatch.setattr(db_tool, "BACKEND_TIMEOUT", 0.2)
+        breaker = CircuitBreaker("backend", min_calls=3, cooldown=60.0)
+        agent = SkillMatchAgent(_FakeLLM(), _Tools(breaker))
+        try:
+            for _ in range(3):
+                result = await agent.run("I can teach React and want to learn Python")
+                assert result["matchCount"] == 0 and "error" in result
+            assert breaker.state == OPEN
+            assert "ReadTimeout" in breaker.last_error
+
+            started = time.perf_counter()
+            result = await agent.run("I can teach React and want to learn Python")
+            assert time.perf_counter() - started < 0.1
+            assert "circuit open" in result["error"]
+            assert breaker.rejected == 1
+        finally:
+            server.close()
+
+    asyncio.run(scenario())
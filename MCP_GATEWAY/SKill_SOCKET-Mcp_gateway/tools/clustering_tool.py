@@ -4,29 +4,66 @@ Clustering Tool for Study Group Formation
 Provides K-Means and Agglomerative clustering on student skill-profile vectors,
 with a complementary-matching post-processing step that maximises skill diversity
 within each group.
+
+Large cohorts
+-------------
+Exact K-Means costs O(n·k) per iteration with k ≈ n / target_size, and Ward
+linkage needs an O(n²) distance matrix, so neither scales to whole-university
+cohorts.  The scalable methods cluster profiles into at most
+``CLUSTER_MAX_CLUSTERS`` archetypes instead:
+
+- ``"minibatch"`` — MiniBatchKMeans, fed in memory-bounded chunks with
+  ``partial_fit`` when the cohort exceeds the memory budget.
+- ``"agglomerative"`` on a cohort whose distance matrix exceeds the budget
+  runs Ward on a random sample and assigns everyone to the nearest sample
+  cluster centroid.
+- ``"auto"`` — exact K-Means up to ``CLUSTER_EXACT_MAX`` students, the
+  minibatch path above that.
+
+The memory budget is ``CLUSTER_MEMORY_MB`` (default 512).
 """
 
 from __future__ import annotations
 
+import heapq
+import os
+
 import numpy as np  # type: ignore[import-untyped]
-from sklearn.cluster import KMeans, AgglomerativeClustering  # type: ignore[import-untyped]
+from sklearn.cluster import AgglomerativeClustering, KMeans, MiniBatchKMeans  # type: ignore[import-untyped]
 from sklearn.preprocessing import MinMaxScaler  # type: ignore[import-untyped]
 
+from tools.group_optimizer import improve_groups  # type: ignore[import-not-found]
+
 
 # ── public API ────────────────────────────────────────────────────────────────
 
+def skill_matrix(students: list[dict], subjects: list[str]) -> np.ndarray:
+    """Raw (n_students × n_subjects) score matrix; missing scores are NaN.
+
+    This is the compact form handed to worker processes: together with the
+    list of names it carries everything the pipeline and report need.
+    """
+    matrix = np.full((len(students), len(subjects)), np.nan)
+    for i, s in enumerate(students):
+        skills = s.get("skills", {})
+        for j, subj in enumerate(subjects):
+            if subj in skills:
+                matrix[i, j] = skills[subj]
+    return matrix
+
+
+def scale_skill_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Fill missing scores with the neutral 5 and min-max scale each subject."""
+    return MinMaxScaler().fit_transform(np.where(np.isnan(matrix), 5.0, matrix))
+
+
 def build_skill_vectors(students: list[dict], subjects: list[str]) -> np.ndarray:
     """Convert a list of student dicts into an (n_students × n_subjects) matrix.
 
     Each student dict must have a ``skills`` sub-dict keyed by subject name,
     with numeric proficiency values (1-10).
     """
-    matrix = []
-    for s in students:
-        row = [s.get("skills", {}).get(subj, 5) for subj in subjects]
-        matrix.append(row)
-    arr = np.array(matrix, dtype=float)
-    return MinMaxScaler().fit_transform(arr)
+    return scale_skill_matrix(skill_matrix(students, subjects))
 
 
 def cluster_kmeans(
@@ -48,6 +85,107 @@ def cluster_agglomerative(
     return agg.fit_predict(vectors)
 
 
+def cluster_minibatch_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    random_state: int = 42,
+    batch_size: int = 4096,
+    chunk_size: int | None = None,
+) -> np.ndarray:
+    """Run MiniBatchKMeans and return label array.
+
+    With ``chunk_size`` the model is trained with ``partial_fit`` on
+    consecutive chunks and labels are predicted chunk by chunk, so only one
+    chunk of ``vectors`` (e.g. a memory-mapped array) is touched at a time.
+    """
+    n = len(vectors)
+    n_clusters = max(1, min(n_clusters, n))
+    km = MiniBatchKMeans(
+        n_clusters=n_clusters, random_state=random_state,
+        batch_size=batch_size, n_init=3,
+    )
+    if chunk_size is None or chunk_size >= n:
+        return km.fit_predict(vectors)
+
+    chunk_size = max(chunk_size, n_clusters)   # first chunk must seed every centroid
+    for start in range(0, n, chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        if len(chunk) >= n_clusters:
+            km.partial_fit(chunk)
+    return np.concatenate([
+        km.predict(vectors[start:start + chunk_size]) for start in range(0, n, chunk_size)
+    ])
+
+
+def cluster_agglomerative_sampled(
+    vectors: np.ndarray,
+    n_clusters: int,
+    sample_size: int = 5000,
+    random_state: int = 42,
+    chunk_size: int = 65536,
+) -> np.ndarray:
+    """Ward clustering on a random sample, then nearest-centroid assignment.
+
+    Memory is O(sample_size²) for the linkage plus O(chunk_size · n_clusters)
+    for the assignment, independent of the cohort size.
+    """
+    n = len(vectors)
+    if n <= sample_size:
+        return cluster_agglomerative(vectors, min(n_clusters, n))
+
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(n, size=sample_size, replace=False))
+    n_clusters = max(1, min(n_clusters, sample_size))
+    sample_labels = cluster_agglomerative(vectors[sample], n_clusters)
+
+    counts = np.bincount(sample_labels, minlength=n_clusters)
+    centroids = np.zeros((n_clusters, vectors.shape[1]))
+    np.add.at(centroids, sample_labels, vectors[sample])
+    centroids /= counts[:, None]
+
+    labels = np.empty(n, dtype=np.intp)
+    sq_norms = (centroids ** 2).sum(axis=1)
+    for start in range(0, n, chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=float)
+        # ‖x − c‖² up to the per-row constant ‖x‖²
+        labels[start:start + len(chunk)] = np.argmin(sq_norms - 2 * chunk @ centroids.T, axis=1)
+    return labels
+
+
+def resolve_method(method: str, n_students: int) -> str:
+    """Map ``"auto"`` to a concrete method for a cohort of ``n_students``."""
+    if method != "auto":
+        return method
+    exact_max = int(os.getenv("CLUSTER_EXACT_MAX", "2000"))
+    return "kmeans" if n_students <= exact_max else "minibatch"
+
+
+def _memory_budget() -> int:
+    return int(float(os.getenv("CLUSTER_MEMORY_MB", "512")) * 1024 * 1024)
+
+
+def cluster_profiles(vectors: np.ndarray, n_groups: int, method: str = "kmeans") -> np.ndarray:
+    """Cluster skill vectors with ``method`` (see module docstring) and return labels."""
+    n, n_subjects = vectors.shape
+    method = resolve_method(method, n)
+    budget = _memory_budget()
+    max_clusters = int(os.getenv("CLUSTER_MAX_CLUSTERS", "256"))
+
+    if method == "agglomerative":
+        # Ward keeps a condensed n·(n−1)/2 float64 distance matrix
+        if n * (n - 1) * 4 <= budget:
+            return cluster_agglomerative(vectors, n_groups)
+        sample_size = int((2 * budget / 8) ** 0.5)
+        return cluster_agglomerative_sampled(vectors, min(n_groups, max_clusters), sample_size)
+    if method == "minibatch":
+        n_clusters = min(n_groups, max_clusters)
+        # row + its distances to every centroid, float64, with 2x headroom
+        row_bytes = 16 * (n_subjects + n_clusters)
+        chunk_size = None if n * row_bytes <= budget else max(budget // row_bytes, 1024)
+        return cluster_minibatch_kmeans(vectors, n_clusters, chunk_size=chunk_size)
+    return cluster_kmeans(vectors, n_groups)
+
+
 def complementary_rebalance(
     students: list[dict],
     labels: np.ndarray,
@@ -64,47 +202,106 @@ def complementary_rebalance(
        so the most polarised students are placed first.
     2. Greedily assign each student to the group whose current aggregate
        skill vector has the *lowest* value on the student's strongest
-       subject, ensuring complementary coverage.
+       subject, ensuring complementary coverage.  Groups that already hold
+       a student of the same cluster (``labels``) are passed over in
+       favour of the next-lowest ones, so archetypes are spread out.
     3. Respect ``target_size`` ±1 to keep groups roughly equal.
     """
-    n = len(students)
+    groups = _rebalance_indices(vectors, n_groups, target_size, labels)
+    return [[students[i] for i in g] for g in groups]
+
+
+def _rebalance_indices(
+    vectors: np.ndarray,
+    n_groups: int,
+    target_size: int,
+    labels: np.ndarray | None = None,
+    lookahead: int = 8,
+) -> list[list[int]]:
+    """Index-based core of :func:`complementary_rebalance`.
+
+    Instead of scanning every group for every student (O(n·g)), keep one
+    min-heap per subject of ``(group sum on that subject, group index)``
+    over the groups that still have room.  Placing a student pops the top
+    of the heap for their strongest subject; the chosen group's entries are
+    then re-pushed with its new sums and the old ones are discarded lazily
+    via a per-group version number.  Ties resolve exactly as in the plain
+    scan — lowest sum, then lowest group index — so the assignments are
+    identical, in O(n·S·log g).
+
+    With cluster ``labels``, up to ``lookahead`` groups at the top of the
+    heap that already contain the student's cluster are skipped; if all of
+    them do, the lowest-sum group is taken as without labels.
+    """
+    n_subjects = vectors.shape[1]
     max_size = target_size + 1
     groups: list[list[int]] = [[] for _ in range(n_groups)]
-    group_sums = np.zeros((n_groups, len(subjects)))
+    group_sums = np.zeros((n_groups, n_subjects))
+    version = [0] * n_groups
+    held: list[set[int]] = [set() for _ in range(n_groups)]
+    archetype = labels.tolist() if labels is not None else None
 
-    # Sort by polarisation (descending) — place specialists first
-    order = sorted(
-        range(n),
-        key=lambda i: float(vectors[i].max() - vectors[i].min()),
-        reverse=True,
-    )
+    # Sort by polarisation (descending) — place specialists first.  A stable
+    # sort on the negated gap keeps input order among equal gaps.
+    gaps = vectors.max(axis=1) - vectors.min(axis=1)
+    order = np.argsort(-gaps, kind="stable")
+    strongest = vectors.argmax(axis=1)
 
-    for idx in order:
-        best_group = -1
-        best_score = float("inf")
-        strongest_subj = int(np.argmax(vectors[idx]))
+    heaps = [[(0.0, g, 0) for g in range(n_groups)] for _ in range(n_subjects)]
+    open_groups = n_groups
+    size_heap: list[tuple[int, int]] | None = None
 
-        for g in range(n_groups):
-            if len(groups[g]) >= max_size:
-                continue
-            # prefer the group that is weakest where this student is strongest
-            score = float(group_sums[g][strongest_subj])
-            if score < best_score:
-                best_score = score
-                best_group = g
+    for idx in order.tolist():
+        heap = heaps[strongest[idx]]
+        # drop entries for groups that have been updated or filled since, and
+        # set aside the first few that already hold this student's cluster
+        skipped: list[tuple[float, int, int]] = []
+        while heap:
+            _, g, stamp = heap[0]
+            if stamp != version[g]:
+                heapq.heappop(heap)
+            elif archetype is not None and archetype[idx] in held[g] and len(skipped) < lookahead:
+                skipped.append(heapq.heappop(heap))
+            else:
+                break
+        has_room = bool(heap or skipped)
 
-        if best_group == -1:
-            # overflow — pick the smallest group
-            best_group = min(range(n_groups), key=lambda g: len(groups[g]))
+        if heap:
+            best_group = heap[0][1]
+        elif skipped:
+            best_group = skipped[0][1]
+        else:
+            # overflow — every group is full; pick the smallest group
+            if size_heap is None:
+                size_heap = [(len(members), g) for g, members in enumerate(groups)]
+                heapq.heapify(size_heap)
+            _, best_group = heapq.heappop(size_heap)
+            heapq.heappush(size_heap, (len(groups[best_group]) + 1, best_group))
+
+        for entry in skipped:
+            heapq.heappush(heap, entry)
 
         groups[best_group].append(idx)
         group_sums[best_group] += vectors[idx]
+        version[best_group] += 1
+        if archetype is not None:
+            held[best_group].add(archetype[idx])
+
+        if len(groups[best_group]) < max_size:
+            sums = group_sums[best_group].tolist()
+            stamp = version[best_group]
+            for subj, h in enumerate(heaps):
+                heapq.heappush(h, (sums[subj], best_group, stamp))
+        elif has_room:
+            open_groups -= 1
+
+        # stale entries pile up in heaps of rarely-strongest subjects
+        for subj, h in enumerate(heaps):
+            if len(h) > 4 * open_groups + 64:
+                heaps[subj] = [e for e in h if e[2] == version[e[1]]]
+                heapq.heapify(heaps[subj])
 
-    # Build output
-    result: list[list[dict]] = []
-    for g in groups:
-        result.append([students[i] for i in g])
-    return result
+    return groups
 
 
 def form_study_groups(
@@ -113,6 +310,7 @@ def form_study_groups(
     n_groups: int | None = None,
     target_size: int = 4,
     method: str = "kmeans",
+    assignment: str = "greedy",
 ) -> list[list[dict]]:
     """End-to-end pipeline: vectorise → cluster → rebalance → return groups.
 
@@ -122,32 +320,59 @@ def form_study_groups(
     subjects   : ordered list of subject/skill names.
     n_groups   : desired number of groups (default: ceil(n / target_size)).
     target_size: ideal members per group.
-    method     : ``"kmeans"`` or ``"agglomerative"``.
+    method     : ``"kmeans"``, ``"agglomerative"``, ``"minibatch"`` or
+                 ``"auto"`` (chosen by cohort size; see module docstring).
+    assignment : ``"greedy"`` (complementary rebalance) or ``"local_search"``
+                 (greedy, then time-bounded swap search; see
+                 :mod:`tools.group_optimizer`).
 
     Returns
     -------
     A list of groups, where each group is a list of student dicts.
     """
-    n = len(students)
+    groups = form_group_indices(
+        skill_matrix(students, subjects), n_groups, target_size, method, assignment
+    )
+    return [[students[i] for i in g] for g in groups]
+
+
+def form_group_indices(
+    matrix: np.ndarray,
+    n_groups: int | None = None,
+    target_size: int = 4,
+    method: str = "kmeans",
+    assignment: str = "greedy",
+) -> list[list[int]]:
+    """Matrix form of :func:`form_study_groups`.
+
+    Takes the raw score matrix from :func:`skill_matrix` and returns each
+    group as a list of row indices.
+
+    The cohort is clustered with ``method`` and the labels steer the
+    complementary assignment away from putting two students of the same
+    archetype in one group (see :func:`_rebalance_indices`).
+    """
+    n = len(matrix)
     if n_groups is None:
         n_groups = max(1, -(-n // target_size))   # ceiling division
 
-    vectors = build_skill_vectors(students, subjects)
+    vectors = scale_skill_matrix(matrix)
+    labels = cluster_profiles(vectors, n_groups, method)
 
-    if method == "agglomerative":
-        labels = cluster_agglomerative(vectors, n_groups)
-    else:
-        labels = cluster_kmeans(vectors, n_groups)
-
-    return complementary_rebalance(
-        students, labels, vectors, subjects, n_groups, target_size
-    )
+    groups = _rebalance_indices(vectors, n_groups, target_size, labels)
+    if assignment == "local_search":
+        groups, _ = improve_groups(np.where(np.isnan(matrix), 5.0, matrix), groups)
+    return groups
 
 
 def compute_group_stats(
     group: list[dict], subjects: list[str]
 ) -> dict:
-    """Return per-subject mean, min, max and a diversity score for a group."""
+    """Return per-subject mean, min, max and a diversity score for a group.
+
+    For a whole partition use :func:`compute_partition_stats`, which does
+    every group in one pass over the skill matrix.
+    """
     if not group:
         return {"subjects": {}, "diversity_score": 0.0}
     matrix = np.array(
@@ -169,3 +394,86 @@ def compute_group_stats(
     diversity = round(float(np.mean(ranges)), 2) if ranges else 0.0
 
     return {"subjects": stats, "diversity_score": diversity}
+
+
+def groups_to_labels(groups: list[list[int]], n: int | None = None) -> np.ndarray:
+    """Turn index groups into a label vector (``-1`` for rows in no group)."""
+    if n is None:
+        n = sum(len(g) for g in groups)
+    labels = np.full(n, -1, dtype=np.intp)
+    for g, members in enumerate(groups):
+        labels[members] = g
+    return labels
+
+
+def compute_partition_stats(
+    matrix: np.ndarray, labels: np.ndarray, n_groups: int | None = None
+) -> dict:
+    """Per-group statistics for a whole partition in one vectorised pass.
+
+    Parameters
+    ----------
+    matrix   : (n_students × n_subjects) scores, missing already filled.
+    labels   : group id per row (``-1`` rows are ignored).
+    n_groups : number of groups (default ``labels.max() + 1``).
+
+    Returns
+    -------
+    ``{"size", "mean", "min", "max", "range", "diversity"}`` — ``size`` and
+    ``diversity`` are (n_groups,) arrays, the rest (n_groups × n_subjects).
+    Empty groups have size 0 and all-zero statistics.
+    """
+    labels = np.asarray(labels)
+    if n_groups is None:
+        n_groups = int(labels.max()) + 1 if len(labels) else 0
+    n_subjects = matrix.shape[1]
+
+    keep = labels >= 0
+    order = np.argsort(labels[keep], kind="stable")
+    sorted_labels = labels[keep][order]
+    rows = np.asarray(matrix)[keep][order].astype(float, copy=False)
+
+    size = np.bincount(sorted_labels, minlength=n_groups)
+    present = np.flatnonzero(size)
+    starts = np.searchsorted(sorted_labels, present)
+
+    total = np.zeros((n_groups, n_subjects))
+    low = np.zeros((n_groups, n_subjects))
+    high = np.zeros((n_groups, n_subjects))
+    if len(present):
+        total[present] = np.add.reduceat(rows, starts, axis=0)
+        low[present] = np.minimum.reduceat(rows, starts, axis=0)
+        high[present] = np.maximum.reduceat(rows, starts, axis=0)
+
+    mean = np.divide(total, size[:, None], out=np.zeros_like(total), where=size[:, None] > 0)
+    spread = high - low
+    diversity = spread.mean(axis=1) if n_subjects else np.zeros(n_groups)
+    return {
+        "size": size,
+        "mean": mean,
+        "min": low,
+        "max": high,
+        "range": spread,
+        "diversity": diversity,
+    }
+
+
+def partition_group_stats(partition: dict, group: int, subjects: list[str]) -> dict:
+    """One group of :func:`compute_partition_stats` in the
+    :func:`compute_group_stats` format."""
+    if not partition["size"][group]:
+        return {"subjects": {}, "diversity_score": 0.0}
+    mean, low, high, spread = (
+        partition[key][group].tolist() for key in ("mean", "min", "max", "range")
+    )
+    stats = {
+        subj: {
+            "mean": round(mean[j], 2),
+            "min": low[j],
+            "max": high[j],
+            "range": spread[j],
+        }
+        for j, subj in enumerate(subjects)
+    }
+    diversity = round(float(partition["diversity"][group]), 2) if subjects else 0.0
+    return {"subjects": stats, "diversity_score": diversity}
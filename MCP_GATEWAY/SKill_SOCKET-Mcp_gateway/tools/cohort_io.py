@@ -0,0 +1,121 @@
+"""
+Columnar Cohort Ingestion
+=========================
+Loads student skill data straight into a ``float32`` score matrix — no
+per-student dicts — for the study-group pipeline.
+
+Supported inputs
+----------------
+- **CSV** — one row per student: a name column plus one column per
+  subject; empty cells are missing scores.  Parsed by pandas' C reader.
+- **Parquet / Feather (Arrow)** — same layout; needs ``pyarrow``.
+- **NPY** — a bare (n_students × n_subjects) matrix, memory-mapped; names
+  are generated (``Student 1`` …).
+- **NPZ** — arrays ``scores`` and ``names`` (and optionally ``subjects``).
+
+Every loader returns ``(names, scores, subjects)`` with ``scores`` as a
+float32 array where missing values are NaN, matching
+:func:`tools.clustering_tool.skill_matrix`.
+"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np  # type: ignore[import-untyped]
+
+FORMATS = ("csv", "parquet", "feather", "npy", "npz")
+
+_EXTENSIONS = {
+    ".csv": "csv", ".parquet": "parquet", ".pq": "parquet",
+    ".feather": "feather", ".arrow": "feather", ".npy": "npy", ".npz": "npz",
+}
+
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _EXTENSIONS:
+        raise ValueError(f"Cannot tell the cohort format of {path!r}; pass one of {', '.join(FORMATS)}.")
+    return _EXTENSIONS[ext]
+
+
+def load_cohort(
+    path: str,
+    fmt: str | None = None,
+    subjects: list[str] | None = None,
+    name_column: str = "name",
+) -> tuple[list[str], np.ndarray, list[str]]:
+    """Read a cohort file into ``(names, float32 scores, subjects)``.
+
+    ``subjects`` selects (and orders) the subject columns; by default every
+    column except ``name_column`` is a subject.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "csv":
+        return _load_table(path, fmt, subjects, name_column)
+    if fmt in ("parquet", "feather"):
+        try:
+            import pyarrow  # type: ignore[import-not-found]  # noqa: F401
+        except ImportError:
+            raise RuntimeError(f"{fmt.title()} uploads need the optional 'pyarrow' package.")
+        return _load_table(path, fmt, subjects, name_column)
+    if fmt == "npy":
+        scores = np.load(path, mmap_mode="r", allow_pickle=False)
+        return _from_matrix(None, scores, subjects)
+    if fmt == "npz":
+        with np.load(path, allow_pickle=False) as archive:
+            names = archive["names"].tolist() if "names" in archive else None
+            stored = archive["subjects"].tolist() if "subjects" in archive else None
+            return _from_matrix(names, archive["scores"], subjects or stored)
+    raise ValueError(f"Unknown cohort format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+
+
+def cohort_from_columns(
+    names: list[str] | None, scores, subjects: list[str] | None = None
+) -> tuple[list[str], np.ndarray, list[str]]:
+    """Validate a dense name list plus score matrix (e.g. from JSON)."""
+    return _from_matrix(names, scores, subjects)
+
+
+# ── helpers ───────────────────────────────────────────────────────────────────
+
+def _load_table(
+    path: str, fmt: str, subjects: list[str] | None, name_column: str
+) -> tuple[list[str], np.ndarray, list[str]]:
+    import pandas as pd  # type: ignore[import-untyped]
+
+    columns = [name_column, *subjects] if subjects else None
+    if fmt == "csv":
+        dtype = {s: "float32" for s in subjects} if subjects else None
+        frame = pd.read_csv(path, usecols=columns, dtype=dtype, skipinitialspace=True)
+    elif fmt == "parquet":
+        frame = pd.read_parquet(path, columns=columns)
+    else:
+        frame = pd.read_feather(path, columns=columns)
+
+    if name_column not in frame.columns:
+        raise ValueError(f"Cohort file has no {name_column!r} column.")
+    subjects = subjects or [c for c in frame.columns if c != name_column]
+    if not subjects:
+        raise ValueError("Cohort file has no subject columns.")
+    names = frame[name_column].astype(str).tolist()
+    scores = frame[subjects].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float32)
+    return names, scores, [str(s) for s in subjects]
+
+
+def _from_matrix(
+    names: list[str] | None, scores, subjects: list[str] | None
+) -> tuple[list[str], np.ndarray, list[str]]:
+    scores = np.asarray(scores, dtype=np.float32)
+    if scores.ndim != 2:
+        raise ValueError(f"Score matrix must be 2-D, got shape {scores.shape}.")
+    n, n_subjects = scores.shape
+    if subjects is None:
+        subjects = [f"Subject {j + 1}" for j in range(n_subjects)]
+    if len(subjects) != n_subjects:
+        raise ValueError(f"{len(subjects)} subjects given for a matrix with {n_subjects} columns.")
+    if names is None:
+        names = [f"Student {i + 1}" for i in range(n)]
+    if len(names) != n:
+        raise ValueError(f"{len(names)} names given for a matrix with {n} rows.")
+    return [str(x) for x in names], scores, list(subjects)
@@ -0,0 +1,197 @@
+"""
+Search Context Builder
+======================
+Packs web-search results into a prompt context of bounded size.
+
+Pipeline
+--------
+1. Split each result's ``content`` into sentence-aligned passages of about
+   ``passage_tokens`` tokens.
+2. Rank passages against the query with Okapi BM25.
+3. Walk the ranking, skipping near-duplicates (word-shingle Jaccard
+   similarity ≥ ``dedup_threshold`` with an already chosen passage), until
+   the ``token_budget`` is spent.  A passage that could not be split (e.g.
+   one long unpunctuated blob) and does not fit is cut to the remaining
+   budget rather than dropped, so one large hit still yields context.
+4. Number sources by URL in order of first use, so every ``[n]`` in the
+   context matches ``sources[n - 1]``.
+
+Token counts are estimated at ~4 characters per token.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from collections import Counter
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def split_passages(text: str, passage_tokens: int = 80) -> list[str]:
+    """Split ``text`` into passages of roughly ``passage_tokens`` tokens."""
+    passages: list[str] = []
+    current: list[str] = []
+    size = 0
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        if not sentence:
+            continue
+        cost = estimate_tokens(sentence)
+        if current and size + cost > passage_tokens:
+            passages.append(" ".join(current))
+            current, size = [], 0
+        current.append(sentence)
+        size += cost
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` at a word boundary so it estimates to at most ``max_tokens``."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, (max_tokens - 1) * 4 - 1)
+    cut = text[:limit]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "…" if cut else ""
+
+
+def bm25_scores(query: str, documents: list[list[str]], k1: float = 1.5, b: float = 0.75) -> list[float]:
+    """Okapi BM25 score of each tokenised document for ``query``."""
+    n = len(documents)
+    if n == 0:
+        return []
+    avg_len = sum(len(d) for d in documents) / n or 1.0
+    df: Counter = Counter()
+    for doc in documents:
+        df.update(set(doc))
+    terms = set(_words(query))
+    scores = []
+    for doc in documents:
+        tf = Counter(doc)
+        score = 0.0
+        for term in terms:
+            if term not in tf:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            freq = tf[term]
+            score += idf * freq * (k1 + 1) / (freq + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def _shingles(words: list[str], size: int = 3) -> set[tuple[str, ...]]:
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def build_context(
+    query: str,
+    results: list[dict],
+    token_budget: int | None = None,
+    passage_tokens: int = 80,
+    dedup_threshold: float = 0.8,
+    numbered: bool = True,
+) -> dict:
+    """Select the most relevant search passages that fit ``token_budget``.
+
+    Parameters
+    ----------
+    query          : the user query passages are ranked against.
+    results        : Tavily results (``content``, ``url``, optional ``title``).
+    token_budget   : context size limit (default ``CONTEXT_TOKEN_BUDGET`` or 1500).
+    passage_tokens : target passage length.
+    dedup_threshold: shingle-Jaccard similarity above which a passage is
+                     considered a duplicate.
+    numbered       : label passages ``Source [n]`` (with URL) for citation,
+                     or plain ``Source:`` when citations are not needed.
+
+    Returns
+    -------
+    ``{"text", "sources", "tokens", "passages_used", "passages_total"}`` where
+    ``sources[n - 1]`` is the source cited as ``[n]`` in ``text``.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    passages: list[dict] = []
+    for r_idx, r in enumerate(results):
+        for p_idx, text in enumerate(split_passages(r.get("content") or "", passage_tokens)):
+            words = _words(text)
+            passages.append({
+                "result": r_idx, "order": p_idx, "text": text,
+                "words": words, "tokens": estimate_tokens(text),
+            })
+
+    scores = bm25_scores(query, [p["words"] for p in passages])
+    # Stable tie-break on original position keeps Tavily's own ranking.
+    ranked = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+
+    chosen: list[dict] = []
+    chosen_shingles: list[set] = []
+    used = 0
+    truncated = False
+    for i in ranked:
+        p = passages[i]
+        if used + p["tokens"] > token_budget:
+            remaining = token_budget - used
+            if truncated or p["tokens"] <= passage_tokens or remaining < passage_tokens // 4:
+                continue
+            text = truncate_to_tokens(p["text"], remaining)
+            if not text:
+                continue
+            p = {**p, "text": text, "words": _words(text), "tokens": estimate_tokens(text)}
+            truncated = True
+        shingles = _shingles(p["words"])
+        if any(_jaccard(shingles, other) >= dedup_threshold for other in chosen_shingles):
+            continue
+        chosen.append(p)
+        chosen_shingles.append(shingles)
+        used += p["tokens"]
+
+    # Number sources by URL in order of relevance of their best passage.
+    source_index: dict[str, int] = {}
+    sources: list[dict] = []
+    for p in chosen:
+        r = results[p["result"]]
+        url = r.get("url", "")
+        if url not in source_index:
+            source_index[url] = len(sources) + 1
+            sources.append({"url": url, "title": r.get("title", "")})
+
+    # Present passages grouped by source, in reading order within a source.
+    chosen.sort(key=lambda p: (source_index[results[p["result"]].get("url", "")], p["result"], p["order"]))
+    blocks: list[str] = []
+    for p in chosen:
+        url = results[p["result"]].get("url", "")
+        if numbered:
+            blocks.append(f"Source [{source_index[url]}]: {p['text']} (URL: {url})")
+        else:
+            blocks.append(f"Source: {p['text']}")
+
+    return {
+        "text": "\n\n".join(blocks),
+        "sources": sources,
+        "tokens": used,
+        "passages_used": len(chosen),
+        "passages_total": len(passages),
+    }
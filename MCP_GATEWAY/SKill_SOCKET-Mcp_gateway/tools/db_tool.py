@@ -1,28 +1,45 @@
+import logging
 import os
+
 import httpx  # type: ignore[import-untyped]
 
+from mcp_server.circuit_breaker import CircuitBreaker, guard  # type: ignore[import-not-found]
+from mcp_server.http_pool import lease  # type: ignore[import-not-found]
+
 BACKEND_API_URL = os.getenv(
     "BACKEND_API_URL", "https://skillsocket-backend.onrender.com"
 )
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "8"))
+
+logger = logging.getLogger(__name__)
 
 
 async def find_complementary_users(
     skills_required: list[str] | None = None,
     skills_offered: list[str] | None = None,
+    client: httpx.AsyncClient | None = None,
+    breaker: CircuitBreaker | None = None,
 ) -> list[dict]:
-    """Find users with complementary skills via the SkillSocket backend API."""
+    """Find users with complementary skills via the SkillSocket backend API.
+
+    A ``breaker`` fails the call fast while the backend is known to be down.
+    The call is bounded by the httpx timeout (``BACKEND_TIMEOUT`` seconds)
+    rather than an outer deadline, so a hanging backend surfaces as an
+    ``httpx.TimeoutException`` the breaker counts as a failure.
+    """
     skills_required = skills_required or []
     skills_offered = skills_offered or []
 
-    print("🔍 Searching for users via backend API...")
-    print(f"   - Want to learn: {skills_required}")
-    print(f"   - Can teach:     {skills_offered}")
+    logger.debug(
+        "Searching for users via backend API",
+        extra={"skills_required": skills_required, "skills_offered": skills_offered},
+    )
 
     required_skill = skills_required[0] if skills_required else ""
     offered_skill = skills_offered[0] if skills_offered else ""
 
     if not required_skill and not offered_skill:
-        print("⚠️  No skills provided")
+        logger.info("No skills provided; skipping user search")
         return []
 
     api_url = f"{BACKEND_API_URL}/api/users/match"
@@ -32,18 +49,18 @@ async def find_complementary_users(
     if offered_skill:
         params["offered"] = offered_skill
 
-    print(f"🌐 Calling API: {api_url}  params={params}")
+    logger.debug("Calling backend API", extra={"url": api_url, "params": params})
 
     try:
-        async with httpx.AsyncClient(timeout=8.0) as client:
-            response = await client.get(api_url, params=params)
+        async with guard(breaker), lease(client, BACKEND_TIMEOUT) as http:
+            response = await http.get(api_url, params=params, timeout=BACKEND_TIMEOUT)
             response.raise_for_status()
             data = response.json()
 
         if isinstance(data, list):
-            print(f"✅ API returned {len(data)} users")
+            logger.debug("Backend API returned users", extra={"users": len(data)})
             return data
-        print(f"⚠️  API returned unexpected format: {data}")
+        logger.warning("Backend API returned an unexpected format", extra={"response": str(data)[:200]})
         return []
 
     except httpx.TimeoutException:
@@ -58,18 +75,21 @@ async def find_complementary_users(
         raise RuntimeError(f"Network error: {exc}")
 
 
-async def test_connection() -> dict:
+async def test_connection(client: httpx.AsyncClient | None = None) -> dict:
     """Test connectivity to the backend API."""
-    print("🧪 Testing backend API connectivity...")
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{BACKEND_API_URL}/api/health")
+        async with lease(client, 5.0) as http:
+            response = await http.get(f"{BACKEND_API_URL}/api/health", timeout=5.0)
         if response.status_code == 200:
-            print("✅ Backend API is accessible")
             data = response.json()
-            print(f"📊 API Health: {data}")
+            logger.debug("Backend API is accessible", extra={"health": data})
             return {"success": True, "apiStatus": data}
         raise RuntimeError(f"API returned status {response.status_code}")
     except Exception as exc:
-        print(f"❌ API test failed: {exc}")
+        logger.warning("Backend API test failed", extra={"error": str(exc)})
         return {"success": False, "error": str(exc)}
+
+
+async def backend_reachable(client: httpx.AsyncClient | None = None) -> bool:
+    """Health check used to probe the backend's open circuit."""
+    return (await test_connection(client))["success"]
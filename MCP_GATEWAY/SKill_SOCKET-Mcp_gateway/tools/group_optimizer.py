@@ -0,0 +1,176 @@
+"""
+Group Optimizer
+===============
+Time-bounded local search that improves the greedy complementary groups.
+
+Objective
+---------
+The *diversity* of a group is the mean over subjects of ``max − min`` score
+within the group — the same measure :func:`tools.clustering_tool.compute_group_stats`
+reports.  The objective is the average diversity over all groups.
+
+Search
+------
+Each round pairs the groups up at random and, for every pair at once,
+evaluates *all* member swaps in one vectorised pass.  Leave-one-out maxima
+and minima per group (from the top two / bottom two members per subject)
+give each swap's exact new ranges in O(m²·S) per pair, without rebuilding
+groups.  The best improving swap of every pair is applied.  Swaps never
+change group sizes, so the ``target_size`` ±1 constraint of the greedy
+result is preserved.
+
+The search stops when the wall-clock ``time_budget`` is spent, or after
+``patience`` consecutive rounds without an improving swap.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+import numpy as np  # type: ignore[import-untyped]
+
+_EPS = 1e-9
+
+
+def _padded(groups: list[list[int]], width: int) -> tuple[np.ndarray, np.ndarray]:
+    """Member indices of each group padded with -1 to ``width``, plus a validity mask."""
+    sizes = np.fromiter((len(g) for g in groups), dtype=np.intp, count=len(groups))
+    members = np.full((len(groups), width), -1, dtype=np.intp)
+    if sizes.sum():
+        rows = np.repeat(np.arange(len(groups)), sizes)
+        cols = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        members[rows, cols] = np.fromiter((i for g in groups for i in g), dtype=np.intp)
+    return members, members >= 0
+
+
+def _ranges(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Per-group, per-subject ``max − min`` over valid members of (G, m, S) ``values``."""
+    mask = valid[..., None]
+    return np.where(mask, values, -np.inf).max(axis=1) - np.where(mask, values, np.inf).min(axis=1)
+
+
+def _objective(matrix: np.ndarray, members: np.ndarray, valid: np.ndarray, chunk: int = 65536) -> float:
+    nonempty = valid.any(axis=1)
+    if not nonempty.any():
+        return 0.0
+    total = 0.0
+    for start in range(0, len(members), chunk):
+        m, v = members[start:start + chunk], valid[start:start + chunk]
+        keep = v.any(axis=1)
+        total += float(_ranges(matrix[np.maximum(m[keep], 0)], v[keep]).mean(axis=1).sum())
+    return total / int(nonempty.sum())
+
+
+def diversity_objective(matrix: np.ndarray, groups: list[list[int]]) -> float:
+    """Average group diversity (mean per-subject range) of a partition."""
+    width = max((len(g) for g in groups), default=0)
+    if width == 0:
+        return 0.0
+    return _objective(matrix, *_padded(groups, width))
+
+
+def _leave_one_out(values: np.ndarray, valid: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per member: max and min of the *other* valid members, per subject.
+
+    ``values`` is (pairs, m, S); the result has the same shape.
+    """
+    hi = np.where(valid[..., None], values, -np.inf)
+    lo = np.where(valid[..., None], values, np.inf)
+    hi_sorted = -np.sort(-hi, axis=1)
+    lo_sorted = np.sort(lo, axis=1)
+    loo_max = np.where(hi == hi_sorted[:, :1], hi_sorted[:, 1:2], hi_sorted[:, :1])
+    loo_min = np.where(lo == lo_sorted[:, :1], lo_sorted[:, 1:2], lo_sorted[:, :1])
+    return loo_max, loo_min
+
+
+def _best_swaps(
+    matrix: np.ndarray, members: np.ndarray, valid: np.ndarray, a: np.ndarray, b: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Best swap (i in group a, j in group b) and its gain, for each pair (a, b)."""
+    ma, mb = members[a], members[b]
+    va, vb = valid[a], valid[b]
+    xa = matrix[np.maximum(ma, 0)]                       # (P, m, S)
+    xb = matrix[np.maximum(mb, 0)]
+    old = (_ranges(xa, va) + _ranges(xb, vb)).sum(axis=1)   # (P,)
+
+    a_max, a_min = _leave_one_out(xa, va)
+    b_max, b_min = _leave_one_out(xb, vb)
+    # group a loses member i and gains j; group b loses j and gains i
+    new_a = (np.maximum(a_max[:, :, None], xb[:, None]) - np.minimum(a_min[:, :, None], xb[:, None])).sum(axis=3)
+    new_b = (np.maximum(b_max[:, None], xa[:, :, None]) - np.minimum(b_min[:, None], xa[:, :, None])).sum(axis=3)
+    gain = new_a + new_b - old[:, None, None]           # (P, m, m)
+    gain = np.where(va[:, :, None] & vb[:, None, :], gain, -np.inf)
+
+    flat = gain.reshape(len(a), -1)
+    best = flat.argmax(axis=1)
+    width = members.shape[1]
+    return best // width, best % width, flat[np.arange(len(a)), best]
+
+
+def improve_groups(
+    matrix: np.ndarray,
+    groups: list[list[int]],
+    time_budget: float | None = None,
+    patience: int = 10,
+    random_state: int = 42,
+    chunk_pairs: int = 1024,
+) -> tuple[list[list[int]], dict]:
+    """Improve ``groups`` (row indices into ``matrix``) by pairwise member swaps.
+
+    Parameters
+    ----------
+    matrix      : (n_students × n_subjects) raw scores, missing filled with 5.
+    groups      : starting partition, e.g. from the greedy rebalance.
+    time_budget : wall-clock limit in seconds (default ``GROUP_SEARCH_BUDGET_MS``
+                  or 200 ms).
+    patience    : stop after this many rounds without an improving swap.
+
+    Returns
+    -------
+    ``(groups, report)`` where ``report`` has the objective ``before`` and
+    ``after``, the number of ``rounds`` and ``swaps`` and ``elapsed_ms``.
+    """
+    if time_budget is None:
+        time_budget = float(os.getenv("GROUP_SEARCH_BUDGET_MS", "200")) / 1000
+    started = time.perf_counter()
+    width = max((len(g) for g in groups), default=0)
+    members, valid = _padded(groups, width)
+    before = _objective(matrix, members, valid) if width else 0.0
+    # keep back as long as the final objective evaluation will take
+    deadline = started + time_budget - (time.perf_counter() - started)
+
+    rng = np.random.default_rng(random_state)
+    rounds = swaps = idle = 0
+    if len(groups) >= 2 and width >= 2:
+        while idle < patience and time.perf_counter() < deadline:
+            rounds += 1
+            order = rng.permutation(len(groups))
+            order = order[:len(order) // 2 * 2].reshape(-1, 2)
+            improved = False
+            for start in range(0, len(order), chunk_pairs):
+                if time.perf_counter() >= deadline:
+                    break
+                pairs = order[start:start + chunk_pairs]
+                a, b = pairs[:, 0], pairs[:, 1]
+                i, j, gain = _best_swaps(matrix, members, valid, a, b)
+                hit = gain > _EPS
+                if not hit.any():
+                    continue
+                improved = True
+                swaps += int(hit.sum())
+                a, b, i, j = a[hit], b[hit], i[hit], j[hit]
+                # pairs are disjoint, so all swaps of a chunk apply at once
+                members[a, i], members[b, j] = members[b, j], members[a, i].copy()
+            idle = 0 if improved else idle + 1
+
+    after = _objective(matrix, members, valid) if width else 0.0
+    # valid members stay a prefix of each row: swaps only exchange valid slots
+    groups = [row[:k] for row, k in zip(members.tolist(), valid.sum(axis=1).tolist())]
+    return groups, {
+        "before": round(before, 4),
+        "after": round(after, 4),
+        "rounds": rounds,
+        "swaps": swaps,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
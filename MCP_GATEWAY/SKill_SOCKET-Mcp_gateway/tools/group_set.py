@@ -0,0 +1,266 @@
+"""
+Incremental Study-Group Set
+===========================
+Keeps a formed set of study groups up to date as students join, leave or
+change their skills, without re-clustering the cohort.
+
+State per group is its member list, its size and the sum of its members'
+scaled skill vectors — the same aggregate the greedy complementary
+rebalance works with.  Every operation touches only the groups it affects:
+
+- ``add_student`` — place the student in the open group (< target + 1
+  members) with the lowest aggregate on the student's strongest subject.
+  If every group is full, a new group is opened with the student and
+  topped up to ``target_size − 1`` with one member from each of the
+  largest groups.
+- ``remove_student`` — if the group drops below ``target_size − 1``, it is
+  dissolved into groups with room; if there is not enough room, members
+  are borrowed from the largest groups instead.  A group left empty is
+  closed, even when it was the only one.
+- ``update_skills`` — adjust the member's row and its group's aggregate in
+  place; membership is kept stable.
+
+Each step is a vectorised O(groups) scan over the aggregates, so a change
+costs O(groups · subjects) instead of a full re-cluster.  Skill vectors are
+scaled with the per-subject min / max of the cohort the set was built from.
+"""
+
+from __future__ import annotations
+
+import numpy as np  # type: ignore[import-untyped]
+
+from tools.clustering_tool import compute_partition_stats, partition_group_stats  # type: ignore[import-not-found]
+
+
+class StudyGroupSet:
+    """Mutable set of study groups with per-group aggregate vectors."""
+
+    def __init__(
+        self,
+        subjects: list[str],
+        names: list[str],
+        scores: np.ndarray,
+        groups: list[list[int]],
+        target_size: int = 4,
+    ):
+        if len(set(names)) != len(names):
+            raise ValueError("Student names must be unique within a group set.")
+        self.subjects = list(subjects)
+        self.target_size = target_size
+        self.min_size = max(1, target_size - 1)
+        self.max_size = target_size + 1
+
+        filled = np.where(np.isnan(scores), 5.0, scores) if len(scores) else np.full((1, len(subjects)), 5.0)
+        self._low = filled.min(axis=0)
+        span = filled.max(axis=0) - self._low
+        self._span = np.where(span > 0, span, 1.0)
+
+        self._rows: dict[str, np.ndarray] = {name: scores[i].copy() for i, name in enumerate(names)}
+        self._vectors: dict[str, np.ndarray] = {name: self._scale(row) for name, row in self._rows.items()}
+        self._group_of: dict[str, int] = {}
+
+        capacity = max(len(groups), 1)
+        self._members: list[list[str]] = []
+        self._sums = np.zeros((capacity, len(subjects)))
+        self._sizes = np.zeros(capacity, dtype=np.intp)
+        self._active = np.zeros(capacity, dtype=bool)
+        for group in groups:
+            gid = self._new_group()
+            for i in group:
+                self._join(names[i], gid)
+
+        self.added = 0
+        self.removed = 0
+        self.updated = 0
+        self.moved = 0
+
+    # ── operations ────────────────────────────────────────────────────────
+
+    def add_student(self, name: str, skills: dict) -> list[int]:
+        """Place a new student; returns the ids of the groups that changed."""
+        if name in self._rows:
+            raise ValueError(f"Student {name!r} is already in the group set.")
+        row = self._row(skills)
+        self._rows[name] = row
+        self._vectors[name] = self._scale(row)
+        self.added += 1
+
+        gid = self._best_group(self._vectors[name])
+        if gid >= 0:
+            self._join(name, gid)
+            return [gid]
+
+        # every group is full — open a new one and top it up from the largest
+        gid = self._new_group()
+        self._join(name, gid)
+        affected = {gid}
+        while self._sizes[gid] < self.min_size:
+            donor = self._largest_group(exclude=gid, above=self.min_size)
+            if donor < 0:
+                break
+            self._move(self._best_donation(donor, gid), gid)
+            affected.add(donor)
+        return sorted(affected)
+
+    def remove_student(self, name: str) -> list[int]:
+        """Remove a student and repair their group; returns changed group ids."""
+        if name not in self._rows:
+            raise KeyError(name)
+        gid = self._group_of[name]
+        self._leave(name)
+        del self._rows[name], self._vectors[name]
+        self.removed += 1
+
+        affected = {gid}
+        if self._sizes[gid] == 0:
+            self._active[gid] = False
+            return sorted(affected)
+        if self._sizes[gid] >= self.min_size or self._active.sum() == 1:
+            return sorted(affected)
+
+        room = int((self.max_size - self._sizes[self._active]).sum() - (self.max_size - self._sizes[gid]))
+        if room >= self._sizes[gid]:
+            # dissolve: specialists first, as in the greedy rebalance
+            members = sorted(
+                self._members[gid],
+                key=lambda m: float(self._vectors[m].max() - self._vectors[m].min()),
+                reverse=True,
+            )
+            for member in members:
+                target = self._best_group(self._vectors[member], exclude=gid)
+                self._move(member, target)
+                affected.add(target)
+            self._active[gid] = False
+        else:
+            while self._sizes[gid] < self.min_size:
+                donor = self._largest_group(exclude=gid, above=self.min_size)
+                if donor < 0:
+                    break
+                self._move(self._best_donation(donor, gid), gid)
+                affected.add(donor)
+        return sorted(affected)
+
+    def update_skills(self, name: str, skills: dict) -> list[int]:
+        """Merge ``skills`` into a student's profile; returns the changed group id."""
+        if name not in self._rows:
+            raise KeyError(name)
+        row = self._rows[name].copy()
+        for j, subj in enumerate(self.subjects):
+            if subj in skills:
+                row[j] = float(skills[subj])
+        gid = self._group_of[name]
+        vector = self._scale(row)
+        self._sums[gid] += vector - self._vectors[name]
+        self._rows[name], self._vectors[name] = row, vector
+        self.updated += 1
+        return [gid]
+
+    # ── views ─────────────────────────────────────────────────────────────
+
+    def group_ids(self) -> list[int]:
+        return np.flatnonzero(self._active).tolist()
+
+    def group(self, gid: int) -> dict:
+        """Members and statistics of one group, in the agent's summary format."""
+        if not (0 <= gid < len(self._active) and self._active[gid]):
+            raise KeyError(gid)
+        members = self._members[gid]
+        rows = np.array([self._rows[m] for m in members]).reshape(len(members), len(self.subjects))
+        filled = np.where(np.isnan(rows), 5.0, rows)
+        partition = compute_partition_stats(filled, np.zeros(len(members), dtype=np.intp), 1)
+        stats = partition_group_stats(partition, 0, self.subjects)
+        return {
+            "group_id": gid,
+            "members": list(members),
+            "size": len(members),
+            "diversity_score": stats["diversity_score"],
+            "stats": stats["subjects"],
+        }
+
+    def groups(self) -> list[dict]:
+        return [self.group(gid) for gid in self.group_ids()]
+
+    def group_of(self, name: str) -> int:
+        return self._group_of[name]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        sizes = self._sizes[self._active]
+        return {
+            "students": len(self._rows),
+            "groups": int(self._active.sum()),
+            "min_group_size": int(sizes.min()) if len(sizes) else 0,
+            "max_group_size": int(sizes.max()) if len(sizes) else 0,
+            "added": self.added,
+            "removed": self.removed,
+            "updated": self.updated,
+            "moved": self.moved,
+        }
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    def _row(self, skills: dict) -> np.ndarray:
+        return np.array(
+            [float(skills[subj]) if subj in skills else np.nan for subj in self.subjects]
+        )
+
+    def _scale(self, row: np.ndarray) -> np.ndarray:
+        return (np.where(np.isnan(row), 5.0, row) - self._low) / self._span
+
+    def _new_group(self) -> int:
+        free = np.flatnonzero(~self._active)
+        free = free[self._sizes[free] == 0]
+        if len(free):
+            gid = int(free[0])
+        else:
+            gid = len(self._active)
+            grow = max(gid, 1)
+            self._sums = np.vstack([self._sums, np.zeros((grow, len(self.subjects)))])
+            self._sizes = np.concatenate([self._sizes, np.zeros(grow, dtype=np.intp)])
+            self._active = np.concatenate([self._active, np.zeros(grow, dtype=bool)])
+        while len(self._members) <= gid:
+            self._members.append([])
+        self._active[gid] = True
+        self._sums[gid] = 0.0
+        return gid
+
+    def _join(self, name: str, gid: int) -> None:
+        self._members[gid].append(name)
+        self._group_of[name] = gid
+        self._sums[gid] += self._vectors[name]
+        self._sizes[gid] += 1
+
+    def _leave(self, name: str) -> None:
+        gid = self._group_of.pop(name)
+        self._members[gid].remove(name)
+        self._sums[gid] -= self._vectors[name]
+        self._sizes[gid] -= 1
+
+    def _move(self, name: str, gid: int) -> None:
+        self._leave(name)
+        self._join(name, gid)
+        self.moved += 1
+
+    def _best_group(self, vector: np.ndarray, exclude: int = -1) -> int:
+        """Open group weakest on the student's strongest subject, or -1 if all are full."""
+        open_groups = self._active & (self._sizes < self.max_size)
+        if exclude >= 0:
+            open_groups[exclude] = False
+        if not open_groups.any():
+            return -1
+        aggregate = np.where(open_groups, self._sums[:, int(np.argmax(vector))], np.inf)
+        return int(np.argmin(aggregate))
+
+    def _largest_group(self, exclude: int, above: int) -> int:
+        """Largest active group (other than ``exclude``) with more than ``above`` members."""
+        sizes = np.where(self._active, self._sizes, -1)
+        sizes[exclude] = -1
+        gid = int(np.argmax(sizes))
+        return gid if sizes[gid] > above else -1
+
+    def _best_donation(self, donor: int, receiver: int) -> str:
+        """Member of ``donor`` strongest where ``receiver`` is weakest."""
+        weakest = int(np.argmin(self._sums[receiver]))
+        return max(self._members[donor], key=lambda m: self._vectors[m][weakest])
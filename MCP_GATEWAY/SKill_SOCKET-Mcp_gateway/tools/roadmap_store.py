@@ -0,0 +1,63 @@
+"""
+Roadmap Store
+=============
+Persistent store of generated learning roadmaps, keyed by normalised topic
+(``"  Python "`` and ``"python"`` share an entry).  ``RoadmapAgent`` serves
+stored roadmaps immediately and refreshes entries older than ``ttl`` in the
+background.
+
+Configuration: ``ROADMAP_STORE_DB`` (SQLite path; unset or empty disables
+the store) and ``ROADMAP_TTL`` (seconds, default 7 days).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+from mcp_server.singleflight import normalize_query  # type: ignore[import-not-found]
+from tools.sqlite_store import SQLiteKV  # type: ignore[import-not-found]
+
+
+def topic_key(topic: str) -> str:
+    return normalize_query(topic).strip(" ?!.")
+
+
+class RoadmapStore:
+    """Async facade over a ``roadmaps`` SQLite table."""
+
+    def __init__(self, path: str, ttl: float = 7 * 86400.0):
+        self.ttl = ttl
+        self._kv = SQLiteKV(path, "roadmaps")
+
+    @classmethod
+    def from_env(cls) -> "RoadmapStore | None":
+        path = os.getenv("ROADMAP_STORE_DB") or None
+        if path is None:
+            return None
+        return cls(path, ttl=float(os.getenv("ROADMAP_TTL", str(7 * 86400))))
+
+    async def get(self, topic: str) -> dict | None:
+        """Return ``{"topic", "roadmap", "generated_at", "stale"}`` or ``None``."""
+        entry = await asyncio.to_thread(self._kv.get, topic_key(topic))
+        if entry is None:
+            return None
+        generated_at, payload = entry
+        return {
+            "topic": payload.get("topic", topic),
+            "roadmap": payload["roadmap"],
+            "generated_at": generated_at,
+            "stale": time.time() - generated_at >= self.ttl,
+        }
+
+    async def put(self, topic: str, roadmap: str) -> None:
+        await asyncio.to_thread(
+            self._kv.put, topic_key(topic), time.time(), {"topic": topic, "roadmap": roadmap}
+        )
+
+    def __len__(self) -> int:
+        return len(self._kv)
+
+    def close(self) -> None:
+        self._kv.close()
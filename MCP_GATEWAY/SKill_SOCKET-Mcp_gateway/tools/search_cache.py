@@ -0,0 +1,145 @@
+"""
+Web Search Cache
+================
+Caching layer placed in front of the registered ``web_search`` tool.
+
+- Queries are normalised (case / whitespace) before lookup.
+- Results are *fresh* for ``ttl`` seconds.  For a further ``stale_ttl``
+  seconds they are still served immediately while a background task
+  refreshes them (stale-while-revalidate).
+- The in-memory tier is a bounded LRU (:class:`mcp_server.cache.TTLCache`).
+- Optionally, entries are written through to a local SQLite file so the
+  cache survives restarts (``SEARCH_CACHE_DB``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+from mcp_server.cache import TTLCache  # type: ignore[import-not-found]
+from mcp_server.singleflight import normalize_query  # type: ignore[import-not-found]
+from tools.sqlite_store import SQLiteKV  # type: ignore[import-not-found]
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """Callable wrapper: ``await cache(query)`` behaves like ``web_search(query)``."""
+
+    def __init__(
+        self,
+        search: Callable[[str], Awaitable[dict]],
+        max_size: int = 512,
+        ttl: float = 3600.0,
+        stale_ttl: float = 86400.0,
+        db_path: str | None = None,
+    ):
+        self._search = search
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._memory = TTLCache(max_size=max_size, ttl=ttl + stale_ttl)
+        self._store = SQLiteKV(db_path, "search_cache") if db_path else None
+        if self._store is not None:
+            self._store.purge_older_than(time.time() - ttl - stale_ttl)
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    @classmethod
+    def from_env(cls, search: Callable[[str], Awaitable[dict]]) -> "SearchCache":
+        return cls(
+            search,
+            max_size=int(os.getenv("SEARCH_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+            stale_ttl=float(os.getenv("SEARCH_CACHE_STALE_TTL", "86400")),
+            db_path=os.getenv("SEARCH_CACHE_DB") or None,
+        )
+
+    async def __call__(self, query: str) -> dict:
+        key = normalize_query(query)
+        entry = self._memory.get(key)
+        if entry is None and self._store is not None:
+            entry = await asyncio.to_thread(self._store.get, key)
+            if entry is not None and time.time() - entry[0] < self.ttl + self.stale_ttl:
+                self.persistent_hits += 1
+                self._memory.set(key, entry, ttl=self._remaining(entry[0]))
+            else:
+                entry = None
+
+        if entry is not None:
+            fetched_at, value = entry
+            if time.time() - fetched_at < self.ttl:
+                self.fresh_hits += 1
+            else:
+                self.stale_hits += 1
+                self._revalidate(key, query)
+            return value
+
+        self.misses += 1
+        return await self._fetch(key, query)
+
+    # ── helpers ───────────────────────────────────────────────────────────
+
+    def _remaining(self, fetched_at: float) -> float:
+        return max(0.0, fetched_at + self.ttl + self.stale_ttl - time.time())
+
+    async def _fetch(self, key: str, query: str) -> dict:
+        value = await self._search(query)
+        fetched_at = time.time()
+        self._memory.set(key, (fetched_at, value))
+        if self._store is not None:
+            await asyncio.to_thread(self._store.put, key, fetched_at, value)
+        return value
+
+    def _revalidate(self, key: str, query: str) -> None:
+        """Refresh ``key`` in the background; at most one refresh per key at a time."""
+        if key in self._refreshing:
+            return
+        self.refreshes += 1
+
+        async def refresh() -> None:
+            try:
+                await self._fetch(key, query)
+            except Exception as exc:
+                self.refresh_failures += 1
+                logger.warning("Background search refresh failed", extra={"key": key, "error": str(exc)})
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.ensure_future(refresh())
+
+    async def aclose(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def stats(self) -> dict:
+        lookups = self.fresh_hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._memory),
+            "max_size": self._memory.max_size,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "persistent": self._store is not None,
+            "fresh_hits": self.fresh_hits,
+            "stale_hits": self.stale_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.fresh_hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "evictions": self._memory.evictions,
+        }
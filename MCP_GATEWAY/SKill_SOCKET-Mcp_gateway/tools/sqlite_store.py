@@ -0,0 +1,63 @@
+"""
+SQLite Key-Value Store
+======================
+Minimal persistent ``key → (updated_at, JSON payload)`` table on local disk,
+shared by the web-search cache and the roadmap store.  Calls are blocking;
+async callers should wrap them in ``asyncio.to_thread``.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+from typing import Any
+
+
+class SQLiteKV:
+    """One table of JSON values keyed by string, safe to use from worker threads."""
+
+    def __init__(self, path: str, table: str):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table):
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY, updated_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> tuple[float, Any] | None:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT updated_at, payload FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, updated_at: float, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, updated_at, payload) VALUES (?, ?, ?)",
+                (key, updated_at, json.dumps(value)),
+            )
+            self._conn.commit()
+
+    def purge_older_than(self, cutoff: float) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
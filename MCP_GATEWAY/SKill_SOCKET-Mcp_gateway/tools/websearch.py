@@ -1,24 +1,47 @@
 import os
 import httpx  # type: ignore[import-untyped]
 
+from mcp_server.circuit_breaker import CircuitBreaker, guard  # type: ignore[import-not-found]
+from mcp_server.http_pool import lease  # type: ignore[import-not-found]
 
-async def web_search(query: str) -> dict:
-    """Search the web using the Tavily API and return results."""
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com").rstrip("/")
+TAVILY_SEARCH_URL = f"{TAVILY_BASE_URL}/search"
+
+
+async def web_search(
+    query: str,
+    client: httpx.AsyncClient | None = None,
+    breaker: CircuitBreaker | None = None,
+) -> dict:
+    """Search the web using the Tavily API and return results.
+
+    Pass a pooled ``client`` to reuse keep-alive connections; otherwise a
+    one-off client is opened for this call.  A ``breaker`` fails the call
+    fast while Tavily is known to be down.
+    """
     api_key = os.getenv("TAVILY_API_KEY")
     if not api_key:
         raise RuntimeError("TAVILY_API_KEY is not set in environment variables.")
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                "https://api.tavily.com/search",
+        async with guard(breaker), lease(client, 15.0) as http:
+            response = await http.post(
+                TAVILY_SEARCH_URL,
                 json={
                     "api_key": api_key,
                     "query": query,
                     "search_depth": "advanced",
                     "max_results": 5,
                 },
+                timeout=15.0,
             )
             response.raise_for_status()
             return response.json()
     except httpx.HTTPError as exc:
         raise RuntimeError(f"Web search failed. Error: {exc}") from exc
+
+
+async def search_reachable(client: httpx.AsyncClient | None = None) -> bool:
+    """Whether the Tavily API answers at all (used to probe an open circuit)."""
+    async with lease(client, 5.0) as http:
+        response = await http.get(TAVILY_BASE_URL, timeout=5.0)
+    return response.status_code < 500